@@ -1,9 +1,17 @@
 from fastapi import FastAPI, Request, Form, Cookie
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+import os
+import sys
 import pymysql
 from typing import Optional
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_db import get_async_pool
+from db_pool import get_pool
+
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 
@@ -22,14 +30,21 @@ DB_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Shared connection pool for DB_CONFIG (DB_POOL_* settings in db_pool.py), used by init_db
+db_pool = get_pool(DB_CONFIG)
+
+# Async pool for the routes, so remote-database latency doesn't block the event loop
+db = get_async_pool(DB_CONFIG)
+
 # Connect to DB
 def get_db():
-    return pymysql.connect(**DB_CONFIG)
+    # close() returns the connection to the pool
+    return db_pool.connection()
 
 # FIXED init_db() for FreeDB (DO NOT CREATE DATABASE)
 def init_db():
     """Create tables only (FreeDB does NOT allow creating databases)."""
-    conn = pymysql.connect(**DB_CONFIG)
+    conn = get_db()
     cursor = conn.cursor()
 
     # Create students table
@@ -75,6 +90,12 @@ def calculate_grade(average):
 @app.on_event("startup")
 async def startup():
     init_db()
+    await db.fill()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await db.close()
 
 def check_auth(session_token: Optional[str] = None):
     return session_token == "authenticated"
@@ -129,20 +150,13 @@ async def add_student(
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-
     try:
-        cursor.execute(
+        await db.execute(
             "INSERT INTO students (name, roll_number, class) VALUES (%s, %s, %s)",
             (name, roll_number, class_name)
         )
-        conn.commit()
     except pymysql.IntegrityError:
         return RedirectResponse(url="/add-student?error=duplicate", status_code=303)
-    finally:
-        cursor.close()
-        conn.close()
 
     return RedirectResponse(url="/", status_code=303)
 
@@ -152,12 +166,7 @@ async def add_grades_form(request: Request, session: Optional[str] = Cookie(None
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM students ORDER BY name")
-    students = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    students = await db.fetchall("SELECT * FROM students ORDER BY name")
 
     return templates.TemplateResponse("add_grades.html", {
         "request": request,
@@ -175,16 +184,10 @@ async def add_grades(
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    await db.execute(
         "INSERT INTO grades (student_id, subject, marks) VALUES (%s, %s, %s)",
         (student_id, subject, marks)
     )
-    conn.commit()
-    cursor.close()
-    conn.close()
 
     return RedirectResponse(url="/add-grades", status_code=303)
 
@@ -194,10 +197,7 @@ async def view_reports(request: Request, session: Optional[str] = Cookie(None)):
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    students = await db.fetchall("""
         SELECT s.id, s.name, s.roll_number, s.class,
                COUNT(g.id) as subject_count,
                COALESCE(SUM(g.marks), 0) as total_marks,
@@ -208,15 +208,10 @@ async def view_reports(request: Request, session: Optional[str] = Cookie(None)):
         ORDER BY s.name
     """)
 
-    students = cursor.fetchall()
-
     for student in students:
         student['grade'] = calculate_grade(student['average_marks'])
         student['average_marks'] = round(student['average_marks'], 2)
 
-    cursor.close()
-    conn.close()
-
     return templates.TemplateResponse("view_reports.html", {
         "request": request,
         "students": students
@@ -228,17 +223,11 @@ async def student_details(request: Request, student_id: int, session: Optional[s
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-    student = cursor.fetchone()
-
-    cursor.execute(
+    student = await db.fetchone("SELECT * FROM students WHERE id = %s", (student_id,))
+    grades = await db.fetchall(
         "SELECT * FROM grades WHERE student_id = %s ORDER BY subject",
         (student_id,)
     )
-    grades = cursor.fetchall()
 
     if grades:
         total = sum(g['marks'] for g in grades)
@@ -249,9 +238,6 @@ async def student_details(request: Request, student_id: int, session: Optional[s
         average = 0
         grade = 'N/A'
 
-    cursor.close()
-    conn.close()
-
     return templates.TemplateResponse("student_details.html", {
         "request": request,
         "student": student,
@@ -267,12 +253,7 @@ async def delete_student(student_id: int, session: Optional[str] = Cookie(None))
     if not check_auth(session):
         return RedirectResponse(url="/login", status_code=303)
 
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM students WHERE id = %s", (student_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    await db.execute("DELETE FROM students WHERE id = %s", (student_id,))
 
     return RedirectResponse(url="/view-reports", status_code=303)
 
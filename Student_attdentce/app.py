@@ -3,9 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, date
+import os
+import sys
 import pymysql
 from pymysql.cursors import DictCursor
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_db import get_async_pool
+
 app = FastAPI()
 
 # CORS configuration
@@ -27,12 +34,28 @@ DB_CONFIG = {
     'cursorclass': DictCursor
 }
 
-def get_db():
+# Async connection pool for DB_CONFIG, so queries don't block the event loop (DB_POOL_* settings)
+db = get_async_pool(DB_CONFIG)
+
+async def fetch_all(query, args=None):
+    try:
+        return await db.fetchall(query, args)
+    except pymysql.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+async def fetch_one(query, args=None):
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        return conn
+        return await db.fetchone(query, args)
     except pymysql.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.on_event("startup")
+async def startup():
+    await db.fill()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await db.close()
 
 # Models
 class LoginRequest(BaseModel):
@@ -59,131 +82,107 @@ class StudentResponse(BaseModel):
 # Authentication endpoint
 @app.post("/api/login")
 async def login(credentials: LoginRequest):
-    conn = get_db()
-    cursor = conn.cursor()
+    query = "SELECT id, student_name, username FROM students WHERE username = %s AND password = %s"
+    student = await fetch_one(query, (credentials.username, credentials.password))
     
-    try:
-        query = "SELECT id, student_name, username FROM students WHERE username = %s AND password = %s"
-        cursor.execute(query, (credentials.username, credentials.password))
-        student = cursor.fetchone()
-        
-        if not student:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        return {
-            "success": True,
-            "student": student
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    if not student:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    return {
+        "success": True,
+        "student": student
+    }
 
 # Get today's attendance
 @app.get("/api/attendance/today/{student_id}")
 async def get_today_attendance(student_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
+    query = """
+        SELECT * FROM uniform_checks 
+        WHERE student_id = %s 
+        AND check_time >= CURDATE() AND check_time < CURDATE() + INTERVAL 1 DAY
+        ORDER BY check_time DESC
+    """
+    records = await fetch_all(query, (student_id,))
     
-    try:
-        query = """
-            SELECT * FROM uniform_checks 
-            WHERE student_id = %s 
-            AND DATE(check_time) = CURDATE()
-            ORDER BY check_time DESC
-        """
-        cursor.execute(query, (student_id,))
-        records = cursor.fetchall()
-        
-        return {
-            "success": True,
-            "count": len(records),
-            "records": records
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    return {
+        "success": True,
+        "count": len(records),
+        "records": records
+    }
 
 # Get monthly attendance
 @app.get("/api/attendance/month/{student_id}")
 async def get_monthly_attendance(student_id: int, year: int = None, month: int = None):
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if not year or not month:
         now = datetime.now()
         year = now.year
         month = now.month
     
-    try:
-        query = """
-            SELECT * FROM uniform_checks 
-            WHERE student_id = %s 
-            AND YEAR(check_time) = %s 
-            AND MONTH(check_time) = %s
-            ORDER BY check_time DESC
-        """
-        cursor.execute(query, (student_id, year, month))
-        records = cursor.fetchall()
-        
-        # Calculate statistics
-        total_checks = len(records)
-        compliant = sum(1 for r in records if r['overall_compliance'])
-        non_compliant = total_checks - compliant
-        
-        # Calculate compliance rate for each item
-        stats = {
-            'total_checks': total_checks,
-            'compliant': compliant,
-            'non_compliant': non_compliant,
-            'compliance_rate': round((compliant / total_checks * 100) if total_checks > 0 else 0, 2),
-            'item_compliance': {
-                'black_blazer': sum(1 for r in records if r['black_blazer_or_suit']),
-                'tie': sum(1 for r in records if r['tie']),
-                'white_shirt': sum(1 for r in records if r['white_shirt']),
-                'id_card': sum(1 for r in records if r['id_card'])
-            }
-        }
-        
-        return {
-            "success": True,
-            "year": year,
-            "month": month,
-            "statistics": stats,
-            "records": records
+    query = """
+        SELECT * FROM uniform_checks 
+        WHERE student_id = %s 
+        AND check_time >= %s AND check_time < %s
+        ORDER BY check_time DESC
+    """
+    # Half-open month range, so the (student_id, check_time) index is used
+    month_start = datetime(year, month, 1)
+    next_month = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    records = await fetch_all(query, (student_id, month_start, next_month))
+    
+    # Calculate statistics; a pending check (model unreachable, overall_compliance NULL)
+    # is neither compliant nor a violation, as in the teacher rollup
+    total_checks = len(records)
+    compliant = sum(1 for r in records if r['overall_compliance'] == 1)
+    non_compliant = sum(1 for r in records if r['overall_compliance'] == 0)
+    pending = total_checks - compliant - non_compliant
+    decided = compliant + non_compliant
+    
+    # Calculate compliance rate for each item
+    stats = {
+        'total_checks': total_checks,
+        'compliant': compliant,
+        'non_compliant': non_compliant,
+        'pending': pending,
+        'compliance_rate': round((compliant / decided * 100) if decided > 0 else 0, 2),
+        'item_compliance': {
+            'black_blazer': sum(1 for r in records if r['black_blazer_or_suit']),
+            'tie': sum(1 for r in records if r['tie']),
+            'white_shirt': sum(1 for r in records if r['white_shirt']),
+            'id_card': sum(1 for r in records if r['id_card'])
         }
-    finally:
-        cursor.close()
-        conn.close()
+    }
+    
+    return {
+        "success": True,
+        "year": year,
+        "month": month,
+        "statistics": stats,
+        "records": records
+    }
 
 # Get attendance summary
 @app.get("/api/attendance/summary/{student_id}")
 async def get_attendance_summary(student_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
+    # Overall statistics, summed over the student's daily rollup rows
+    query = """
+        SELECT 
+            COALESCE(SUM(total_checks), 0) as total_checks,
+            SUM(compliant) as total_compliant,
+            SUM(non_compliant) as total_non_compliant,
+            SUM(pending) as total_pending,
+            SUM(blazer_count) as blazer_count,
+            SUM(tie_count) as tie_count,
+            SUM(shirt_count) as shirt_count,
+            SUM(id_card_count) as id_card_count
+        FROM daily_compliance_rollup 
+        WHERE student_id = %s
+    """
+    summary = await fetch_one(query, (student_id,))
     
-    try:
-        # Overall statistics
-        query = """
-            SELECT 
-                COUNT(*) as total_checks,
-                SUM(overall_compliance) as total_compliant,
-                SUM(black_blazer_or_suit) as blazer_count,
-                SUM(tie) as tie_count,
-                SUM(white_shirt) as shirt_count,
-                SUM(id_card) as id_card_count
-            FROM uniform_checks 
-            WHERE student_id = %s
-        """
-        cursor.execute(query, (student_id,))
-        summary = cursor.fetchone()
-        
-        return {
-            "success": True,
-            "summary": summary
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    return {
+        "success": True,
+        "summary": summary
+    }
 
 if __name__ == "__main__":
     import uvicorn
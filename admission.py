@@ -0,0 +1,109 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Checks processed at once, and checks allowed to wait for a slot, before requests are shed
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "32"))
+
+# Completions over this window give the drain rate behind Retry-After
+DRAIN_WINDOW_SECONDS = 30
+
+# Retry-After bounds (seconds); the lower bound is also used before any check has finished
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 60
+
+
+class DrainRate:
+    """Recent completions per second, used to tell shed clients when to come back"""
+
+    def __init__(self, window=DRAIN_WINDOW_SECONDS):
+        self.window = window
+        self._completions = deque()
+
+    def record(self):
+        self._completions.append(time.monotonic())
+
+    def per_second(self):
+        now = time.monotonic()
+        while self._completions and self._completions[0] < now - self.window:
+            self._completions.popleft()
+        if not self._completions:
+            return 0.0
+        # Measure over the span actually observed so a fresh process isn't underestimated
+        span = min(self.window, max(now - self._completions[0], 1.0))
+        return len(self._completions) / span
+
+    def retry_after(self, backlog: int):
+        """Seconds until a backlog of this size should have drained"""
+        rate = self.per_second()
+        if rate <= 0:
+            return RETRY_AFTER_MIN
+        return min(max(math.ceil(backlog / rate), RETRY_AFTER_MIN), RETRY_AFTER_MAX)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps in-flight checks, queues a bounded number more and sheds the rest"""
+
+    def __init__(self, max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queued=ADMISSION_MAX_QUEUED):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.drain = DrainRate()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a check slot for the duration of the block, or raise Overloaded"""
+        if self.in_flight + self.queued >= self.max_in_flight + self.max_queued:
+            self.shed += 1
+            # Everyone queued plus this request has to get through the in-flight slots first
+            raise Overloaded(self.drain.retry_after(self.queued + 1))
+
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        wait = time.monotonic() - start
+        self._total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self.drain.record()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_wait_ms": round(self._total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "drain_rate_per_s": round(self.drain.per_second(), 2)
+        }
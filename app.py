@@ -1,16 +1,33 @@
-from fastapi import FastAPI, Request, Form, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Form, UploadFile, File, Header, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import pymysql
+import asyncio
 import base64
-from langchain_openai import ChatOpenAI
 import json
 from datetime import datetime
 import os
-import shutil
 from pathlib import Path
 
+from admission import AdmissionController, Overloaded
+from async_db import get_async_pool
+from batching import UNIFORM_BATCHING, MicroBatcher
+from check_jobs import CheckJobQueue, JobQueueFull
+from check_policy import CheckPolicy
+from compliance_rollup import create_rollup_table, insert_checks
+from db_pool import get_pool
+from idempotency import IdempotencyStore
+from image_preprocess import KEEP_ORIGINAL_UPLOADS, image_mime, normalize_upload
+from inference import invoke_llm
+from model_backends import create_llm
+from prescreen import PRESCREEN_ENABLED, FramePrescreen
+from resilience import ResilientModel
+from uniform_cascade import CASCADE_ENABLED, LocalUniformClassifier
+from upload_store import save_upload
+from result_cache import UniformResultCache, perceptual_hash
+from write_behind import WriteBehindBuffer
+
 app = FastAPI()
 
 # Create necessary directories
@@ -28,6 +45,12 @@ DB_CONFIG = {
     "database": "attendance"
 }
 
+# Shared connection pool for DB_CONFIG (DB_POOL_* settings in db_pool.py), used for startup DDL
+db_pool = get_pool(DB_CONFIG)
+
+# Async pool for request-path queries, so they don't block the event loop
+db = get_async_pool(DB_CONFIG)
+
 
 # llm = ChatOpenAI(
 #     model="qwen/qwen2.5-vl-32b-instruct:free",
@@ -39,21 +62,35 @@ DB_CONFIG = {
 
 API_KEY = "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"
 
-llm = ChatOpenAI(
-    model="google/gemini-2.5-flash-image",  # Very reliable free option
-    temperature=0.1,
-    max_tokens=200,
-    base_url="https://openrouter.ai/api/v1",
-    api_key=API_KEY
-)
+# Model client for MODEL_BACKEND (hosted model, local fake server or in-process stub),
+# with retries, hedged requests and a circuit breaker around every call
+llm = ResilientModel(create_llm(API_KEY))
+
+# Bounds on concurrent and waiting synchronous checks; excess requests get 503 + Retry-After
+admission = AdmissionController()
+
+# Submissions already seen, by Idempotency-Key, so kiosk retries don't re-run a check
+idempotency = IdempotencyStore()
+
+# Per-student cooldown, daily limit and same-day reuse of a compliant result, kept in memory
+check_policy = CheckPolicy()
 
 # Session storage (in production, use proper session management)
 active_sessions = {}
 
+# Local blur/exposure/face checks that reject unusable frames before any model call
+frame_prescreen = FramePrescreen()
+
+# First stage of the cascade: local heuristics, LLM only when unsure (CASCADE_ENABLED=1)
+uniform_classifier = LocalUniformClassifier()
+
+# Recent uniform results, reused when a student resubmits a near-identical frame
+uniform_cache = UniformResultCache()
+
 
 def get_db_connection():
-    """Create database connection"""
-    return pymysql.connect(**DB_CONFIG)
+    """Check out a pooled database connection; close() returns it to the pool"""
+    return db_pool.connection()
 
 
 def create_uniform_table():
@@ -74,12 +111,35 @@ def create_uniform_table():
             id_card BOOLEAN,
             overall_compliance BOOLEAN,
             image_path VARCHAR(500),
+            decision_stage VARCHAR(16),
+            inference_status VARCHAR(16),
             FOREIGN KEY (student_id) REFERENCES students(id)
         )
         """
         
         cursor.execute(query)
+        
+        # Columns added after the table was first created
+        for column in ["decision_stage", "inference_status"]:
+            cursor.execute("SHOW COLUMNS FROM uniform_checks LIKE %s", (column,))
+            if not cursor.fetchone():
+                cursor.execute(f"ALTER TABLE uniform_checks ADD COLUMN {column} VARCHAR(16)")
+        
+        # Indexes behind the per-student and per-day check_time range queries; built online on large tables
+        for index, columns in [
+            ("idx_student_time", "student_id, check_time"),
+            ("idx_time_compliance", "check_time, overall_compliance")
+        ]:
+            cursor.execute("SHOW INDEX FROM uniform_checks WHERE Key_name = %s", (index,))
+            if not cursor.fetchone():
+                cursor.execute(
+                    f"ALTER TABLE uniform_checks ADD INDEX {index} ({columns}), ALGORITHM=INPLACE, LOCK=NONE"
+                )
+        
         connection.commit()
+        
+        # Per-day and per-student-day counters the reports read instead of raw checks
+        create_rollup_table(connection)
         print("Table created successfully!")
         
     except Exception as e:
@@ -89,15 +149,11 @@ def create_uniform_table():
         connection.close()
 
 
-def verify_login(username: str, password: str):
+async def verify_login(username: str, password: str):
     """Verify user credentials"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         query = "SELECT id, student_name FROM students WHERE username=%s AND password=%s"
-        cursor.execute(query, (username, password))
-        result = cursor.fetchone()
+        result = await db.fetchone(query, (username, password))
         
         if result:
             return {"id": result[0], "name": result[1]}
@@ -106,12 +162,9 @@ def verify_login(username: str, password: str):
     except Exception as e:
         print(f"Login error: {e}")
         return None
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def check_uniform_with_llm(image_path: str):
+async def check_uniform_with_llm(image_path: str):
     """Check uniform using LLM - now includes beard detection"""
     try:
         with open(image_path, "rb") as f:
@@ -122,7 +175,7 @@ def check_uniform_with_llm(image_path: str):
 Respond ONLY in JSON:
 {"black_blazer_or_suit": {"present": true/false}, "tie": {"present": true/false}, "white_shirt": {"present": true/false}, "id_card": {"present": true/false}, "beard": {"present": true/false}, "overall_compliance": true/false}"""
 
-        response = llm.invoke([
+        response = await invoke_llm(llm, [
             {
                 "role": "user",
                 "content": [
@@ -130,7 +183,7 @@ Respond ONLY in JSON:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_b64}"
+                            "url": f"data:{image_mime(image_path)};base64,{image_b64}"
                         }
                     }
                 ]
@@ -154,47 +207,222 @@ Respond ONLY in JSON:
         return {"error": str(e)}
 
 
-def save_uniform_check(student_id: int, student_name: str, results: dict, image_path: str):
-    """Save uniform check results to database (beard not included)"""
+async def check_uniform_batch_with_llm(image_paths: list):
+    """Check uniforms for several photos in one LLM call; returns one result per photo"""
+    if len(image_paths) == 1:
+        return [await check_uniform_with_llm(image_paths[0])]
+    
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        content = [{"type": "text", "text": f"""You are given {len(image_paths)} photos, numbered in order.
+For each photo check if wearing: blazer or suit, tie, white shirt, ID card. Also check if person has a beard.
+Respond ONLY with a JSON array of {len(image_paths)} objects, one per photo in the same order:
+[{{"black_blazer_or_suit": {{"present": true/false}}, "tie": {{"present": true/false}}, "white_shirt": {{"present": true/false}}, "id_card": {{"present": true/false}}, "beard": {{"present": true/false}}, "overall_compliance": true/false}}]"""}]
         
-        query = """
-        INSERT INTO uniform_checks 
-        (student_id, student_name, check_time, black_blazer_or_suit, tie, 
-         white_shirt, id_card, overall_compliance, image_path)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        for number, image_path in enumerate(image_paths, start=1):
+            with open(image_path, "rb") as f:
+                image_b64 = base64.b64encode(f.read()).decode()
+            content.append({"type": "text", "text": f"Photo {number}:"})
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{image_mime(image_path)};base64,{image_b64}"
+                }
+            })
+        
+        # Room for one JSON object per photo
+        response = await invoke_llm(llm, [{"role": "user", "content": content}], max_tokens=200 * len(image_paths))
+        
+        # Parse JSON array response
+        response_text = response.content
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        
+        if start_idx != -1 and end_idx > start_idx:
+            results = json.loads(response_text[start_idx:end_idx])
+            if len(results) == len(image_paths):
+                return results
+        error = "Could not parse batch response"
+        
+    except Exception as e:
+        print(f"Error checking uniform batch: {e}")
+        error = str(e)
+    
+    return [{"error": error} for _ in image_paths]
+
+
+# Peak-time batching of uniform checks into multi-image requests (UNIFORM_BATCHING=1)
+uniform_batcher = MicroBatcher(check_uniform_batch_with_llm)
+
+
+async def check_uniform_cached(student_id: int, image_path: str):
+    """Check uniform, reusing a recent result for a near-identical frame from the same student"""
+    phash = await asyncio.to_thread(perceptual_hash, image_path)
+    
+    cached = uniform_cache.get(student_id, phash)
+    if cached is not None:
+        print(f"Uniform cache hit for student {student_id}")
+        return cached
+    
+    if UNIFORM_BATCHING:
+        results = await uniform_batcher.submit(image_path)
+    else:
+        results = await check_uniform_with_llm(image_path)
+    
+    # Only successful classifications are worth reusing
+    if "error" not in results:
+        uniform_cache.put(student_id, phash, results)
+    return results
+
+
+async def check_uniform_cascade(student_id: int, image_path: str):
+    """Decide clearly compliant frames locally, escalating the rest to the LLM; returns (results, stage)"""
+    if CASCADE_ENABLED:
+        local_results, confident = await asyncio.to_thread(uniform_classifier.classify, image_path)
+        if confident:
+            return local_results, "local"
+    
+    return await check_uniform_cached(student_id, image_path), "llm"
+
+
+UNIFORM_CHECK_INSERT = """
+    INSERT INTO uniform_checks 
+    (student_id, student_name, check_time, black_blazer_or_suit, tie, 
+     white_shirt, id_card, overall_compliance, image_path, decision_stage, inference_status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+async def insert_uniform_checks(rows: list):
+    """Write uniform check rows with one multi-row INSERT and add them to the daily rollup, in one transaction"""
+    await insert_checks(db, UNIFORM_CHECK_INSERT, rows)
+
+
+# Optional group commit of uniform check rows (WRITE_BEHIND=sync|async)
+check_writer = WriteBehindBuffer(
+    insert_uniform_checks, permanent_errors=(pymysql.err.IntegrityError, pymysql.err.DataError)
+)
+
+
+async def save_uniform_check(student_id: int, student_name: str, results: dict, image_path: str, decision_stage: str = "llm"):
+    """Save uniform check results to database (beard not included)"""
+    try:
+        # A failed model call is stored as pending (NULL items), never as non-compliant
+        if "error" in results:
+            items = [None] * 5
+            inference_status = "pending"
+        else:
+            items = [
+                results.get("black_blazer_or_suit", {}).get("present", False),
+                results.get("tie", {}).get("present", False),
+                results.get("white_shirt", {}).get("present", False),
+                results.get("id_card", {}).get("present", False),
+                results.get("overall_compliance", False)
+            ]
+            inference_status = "ok"
         
         values = (
             student_id,
             student_name,
             datetime.now(),
-            results.get("black_blazer_or_suit", {}).get("present", False),
-            results.get("tie", {}).get("present", False),
-            results.get("white_shirt", {}).get("present", False),
-            results.get("id_card", {}).get("present", False),
-            results.get("overall_compliance", False),
-            image_path
+            *items,
+            image_path,
+            decision_stage,
+            inference_status
         )
         
-        cursor.execute(query, values)
-        connection.commit()
+        if check_writer.mode == "off":
+            await insert_uniform_checks([values])
+        else:
+            await check_writer.add(values)
         return True
         
     except Exception as e:
         print(f"Error saving check: {e}")
         return False
+
+
+async def run_uniform_check(user: dict, filepath: str):
+    """Run the uniform check on a stored upload, save it and build the response"""
+    # Downscaled, re-encoded copy is what gets sent to the model
+    model_path = await normalize_upload(filepath)
+    if not KEEP_ORIGINAL_UPLOADS:
+        filepath = model_path
+    
+    # Reject blurry, dark or empty frames locally so the kiosk can recapture
+    if PRESCREEN_ENABLED:
+        screen = await asyncio.to_thread(frame_prescreen.screen, model_path)
+        if not screen["ok"]:
+            return {
+                "success": False,
+                "error": "Unusable photo",
+                "reason": screen["reason"],
+                "message": screen["message"],
+                "image_url": f"/{filepath}"
+            }
+    
+    # Check uniform with LLM (includes beard detection)
+    results, decision_stage = await check_uniform_cascade(user['id'], model_path)
+    
+    # Save to database (beard not saved)
+    saved = await save_uniform_check(user['id'], user['name'], results, filepath, decision_stage)
+    
+    # Not recorded (with WRITE_BEHIND=sync this includes a failed flush): don't report success.
+    # Raised rather than returned so an Idempotency-Key retry runs the check again.
+    if not saved:
+        raise HTTPException(status_code=503, detail="Your check could not be saved, please try again")
+    
+    # The model could not be reached: the check is saved as pending, not as a violation
+    if "error" in results:
+        return {
+            "success": False,
+            "error": "Uniform check pending",
+            "message": "The uniform checker is busy right now. Your check was recorded as pending; please try again shortly.",
+            "inference_status": "pending",
+            "image_url": f"/{filepath}"
+        }
+    
+    # Return results including beard detection for UI display
+    return {
+        "success": True,
+        "results": results,
+        "decision_stage": decision_stage,
+        "image_url": f"/{filepath}"
+    }
+
+
+async def run_check_job(payload: dict):
+    """Run a queued check (the check policy admitted it at submission) and record its outcome"""
+    user = payload["user"]
+    response = None
+    try:
+        response = await run_uniform_check(user, payload["filepath"])
+        return response
     finally:
-        cursor.close()
-        connection.close()
+        check_policy.finish(user['id'], response)
+
+
+# Job mode: checks queued by /check-uniform/jobs and run by a bounded worker pool
+check_jobs = CheckJobQueue(run_check_job)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database table on startup"""
+    """Initialize database table and job workers on startup"""
+    db_pool.fill()
     create_uniform_table()
+    await db.fill()
+    check_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop job workers and close pooled model and database connections"""
+    await check_jobs.stop()
+    await check_writer.close()
+    db_pool.close()
+    await db.close()
+    if hasattr(llm, "aclose"):
+        await llm.aclose()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -206,7 +434,7 @@ async def login_page(request: Request):
 @app.post("/login")
 async def login(username: str = Form(...), password: str = Form(...)):
     """Handle login"""
-    user = verify_login(username, password)
+    user = await verify_login(username, password)
     
     if user:
         session_id = f"{user['id']}_{datetime.now().timestamp()}"
@@ -243,7 +471,8 @@ async def dashboard(request: Request, session: str):
 @app.post("/check-uniform")
 async def check_uniform(
     session: str = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    idempotency_key: str = Header(None)
 ):
     """Process uniform check"""
     if session not in active_sessions:
@@ -251,25 +480,135 @@ async def check_uniform(
     
     user = active_sessions[session]
     
-    # Save uploaded image
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"uniform_{user['id']}_{timestamp}.jpg"
-    filepath = f"static/uploads/{filename}"
+    async def run_check():
+        # Cooldown, daily limit and same-day reuse are decided before the upload is stored or a slot taken
+        blocked = check_policy.begin(user['id'])
+        if blocked is not None:
+            return blocked
+        
+        response = None
+        try:
+            async with admission.admit():
+                # Stream the upload to content-addressed storage (identical images are stored once)
+                image_hash, filepath = await save_upload(image)
+                
+                response = await run_uniform_check(user, filepath)
+                return response
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many checks in progress, please try again",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        finally:
+            check_policy.finish(user['id'], response)
     
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    # A resubmission with the same Idempotency-Key gets the first run's result
+    result, replayed = await idempotency.run(("check", user['id']), idempotency_key, run_check)
+    return JSONResponse(result, headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+
+@app.post("/check-uniform/jobs")
+async def submit_uniform_check_job(
+    session: str = Form(...),
+    image: UploadFile = File(...),
+    idempotency_key: str = Header(None)
+):
+    """Queue a uniform check and return a job id immediately"""
+    if session not in active_sessions:
+        raise HTTPException(status_code=401, detail="Unauthorized")
     
-    # Check uniform with LLM (includes beard detection)
-    results = check_uniform_with_llm(filepath)
+    user = active_sessions[session]
     
-    # Save to database (beard not saved)
-    save_uniform_check(user['id'], user['name'], results, filepath)
+    async def submit():
+        # Decided before the upload is stored; a blocked or reused check is answered without a job
+        blocked = check_policy.begin(user['id'])
+        if blocked is not None:
+            return blocked
+        
+        queued = False
+        try:
+            image_hash, filepath = await save_upload(image)
+            job_id = check_jobs.submit(user['id'], {"user": user, "filepath": filepath})["id"]
+            queued = True
+            return job_id
+        except JobQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many checks queued, please try again",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        finally:
+            # Once queued, run_check_job() records the outcome
+            if not queued:
+                check_policy.finish(user['id'], None)
     
-    # Return results including beard detection for UI display
+    # A resubmission with the same Idempotency-Key attaches to the job it already created
+    job_id, replayed = await idempotency.run(("job", user['id']), idempotency_key, submit)
+    if isinstance(job_id, dict):
+        return JSONResponse(job_id, headers={"Idempotent-Replayed": "true"} if replayed else None)
+    
+    job = check_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=410, detail="Check expired, please submit again")
+    
+    return JSONResponse(check_jobs.public(job), status_code=202,
+                        headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+
+def get_session_job(session: str, job_id: str):
+    """Look up a job that belongs to the session's user"""
+    if session not in active_sessions:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    job = check_jobs.get(job_id)
+    if job is None or job["owner"] != active_sessions[session]['id']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/check-uniform/jobs/{job_id}")
+async def get_uniform_check_job(job_id: str, session: str):
+    """Poll the status of a queued uniform check"""
+    job = get_session_job(session, job_id)
+    return JSONResponse(check_jobs.public(job))
+
+
+@app.get("/check-uniform/jobs/{job_id}/events")
+async def stream_uniform_check_job(job_id: str, session: str):
+    """Push job status changes as Server-Sent Events until the check finishes"""
+    job = get_session_job(session, job_id)
+    
+    async def events():
+        while True:
+            changed = check_jobs.watch(job)
+            state = check_jobs.public(job)
+            yield f"event: {state['status']}\ndata: {json.dumps(state)}\n\n"
+            
+            if state["status"] in ("done", "failed"):
+                break
+            if not await check_jobs.wait_for_change(changed, 15):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose runtime counters"""
     return JSONResponse({
-        "success": True,
-        "results": results,
-        "image_url": f"/static/uploads/{filename}"
+        "prescreen": frame_prescreen.stats(),
+        "cascade": uniform_classifier.stats(),
+        "admission": admission.stats(),
+        "idempotency": idempotency.stats(),
+        "check_policy": check_policy.stats(),
+        "db_pool": db_pool.stats(),
+        "db": db.stats(),
+        "write_behind": check_writer.stats(),
+        "model": llm.stats(),
+        "uniform_cache": uniform_cache.stats(),
+        "uniform_batching": uniform_batcher.stats(),
+        "check_jobs": check_jobs.stats()
     })
 
 
@@ -1,16 +1,37 @@
-from fastapi import FastAPI, Request, Form, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Form, UploadFile, File, Header, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import pymysql
+import asyncio
 import base64
-from langchain_openai import ChatOpenAI
 import json
 from datetime import datetime
 import os
-import shutil
+import time
 from pathlib import Path
 
+from admission import AdmissionController, Overloaded
+from async_db import get_async_pool
+from batching import UNIFORM_BATCHING, MicroBatcher
+from check_jobs import CheckJobQueue, JobQueueFull
+from check_policy import CheckPolicy
+from compliance_rollup import create_rollup_table, insert_checks
+from db_pool import get_pool
+from face_embeddings import FACE_VERIFIER, FaceVerifier
+from face_index import FaceIndex
+from idempotency import IdempotencyStore
+from image_preprocess import KEEP_ORIGINAL_UPLOADS, image_mime, normalize_upload
+from inference import invoke_llm
+from model_backends import create_llm
+from prescreen import PRESCREEN_ENABLED, FramePrescreen
+from resilience import ResilientModel
+from reference_store import ReferenceStore
+from result_cache import UniformResultCache, perceptual_hash
+from uniform_cascade import CASCADE_ENABLED, LocalUniformClassifier
+from upload_store import save_upload
+from write_behind import WriteBehindBuffer
+
 app = FastAPI()
 
 # Create necessary directories
@@ -29,15 +50,17 @@ DB_CONFIG = {
     "database": "attendance"
 }
 
+# Shared connection pool for DB_CONFIG (DB_POOL_* settings in db_pool.py), used for startup DDL
+db_pool = get_pool(DB_CONFIG)
+
+# Async pool for request-path queries, so they don't block the event loop
+db = get_async_pool(DB_CONFIG)
+
 API_KEY = "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"
 
-llm = ChatOpenAI(
-    model="google/gemini-2.5-flash-image",
-    temperature=0.1,
-    max_tokens=200,
-    base_url="https://openrouter.ai/api/v1",
-    api_key=API_KEY
-)
+# Model client for MODEL_BACKEND (hosted model, local fake server or in-process stub),
+# with retries, hedged requests and a circuit breaker around every call
+llm = ResilientModel(create_llm(API_KEY))
 
 # User reference images mapping (username -> image filename in static/reference_images/)
 USER_REFERENCE_IMAGES = {
@@ -47,13 +70,59 @@ USER_REFERENCE_IMAGES = {
     "deep26": "me.jpg"
 }
 
+# Reference images held in memory as encoded payloads; enrolled users are added at runtime
+reference_store = ReferenceStore(USER_REFERENCE_IMAGES)
+
+# Local embedding verifier; reference embeddings are precomputed at startup (FACE_VERIFIER=local)
+face_verifier = FaceVerifier(reference_store)
+
+# Kiosk identification mode: students are found by their photo instead of logging in.
+# Needs the SFace models (see README.md); stays off without a local embedder.
+IDENTIFY_ENABLED = os.getenv("IDENTIFY_ENABLED", "0") == "1" and face_verifier.embedder is not None
+if os.getenv("IDENTIFY_ENABLED", "0") == "1" and not IDENTIFY_ENABLED:
+    print("Identification disabled: no local face embedding model is loaded")
+
+# 1:N search against the whole gallery needs a tighter distance than 1:1 verification
+# (SFace 1:1 is 0.637), and the runner-up must be at least this much further away
+IDENTIFY_MAX_DISTANCE = float(os.getenv("IDENTIFY_MAX_DISTANCE", "0.5"))
+IDENTIFY_MIN_MARGIN = float(os.getenv("IDENTIFY_MIN_MARGIN", "0.08"))
+
+# Nearest-neighbour index over every enrolled student's reference embedding
+face_index = FaceIndex()
+
+# Teacher credentials for enrolling reference images (same as the teacher portal)
+TEACHER_USERNAME = "teach26"
+TEACHER_PASSWORD = "teach@123"
+
+# "separate" runs face verification and the uniform check as two model calls,
+# "combined" sends both images once and asks for a single JSON answer
+CHECK_MODE = os.getenv("CHECK_MODE", "separate")
+
+# Bounds on concurrent and waiting synchronous checks; excess requests get 503 + Retry-After
+admission = AdmissionController()
+
+# Submissions already seen, by Idempotency-Key, so kiosk retries don't re-run a check
+idempotency = IdempotencyStore()
+
+# Per-student cooldown, daily limit and same-day reuse of a compliant result, kept in memory
+check_policy = CheckPolicy()
+
 # Session storage
 active_sessions = {}
 
+# Local blur/exposure/face checks that reject unusable frames before any model call
+frame_prescreen = FramePrescreen()
+
+# First stage of the cascade: local heuristics, LLM only when unsure (CASCADE_ENABLED=1)
+uniform_classifier = LocalUniformClassifier()
+
+# Recent uniform results, reused when a student resubmits a near-identical frame
+uniform_cache = UniformResultCache()
+
 
 def get_db_connection():
-    """Create database connection"""
-    return pymysql.connect(**DB_CONFIG)
+    """Check out a pooled database connection; close() returns it to the pool"""
+    return db_pool.connection()
 
 
 def create_uniform_table():
@@ -75,12 +144,35 @@ def create_uniform_table():
             overall_compliance BOOLEAN,
             image_path VARCHAR(500),
             face_verified BOOLEAN,
+            decision_stage VARCHAR(16),
+            inference_status VARCHAR(16),
             FOREIGN KEY (student_id) REFERENCES students(id)
         )
         """
         
         cursor.execute(query)
+        
+        # Columns added after the table was first created
+        for column in ["decision_stage", "inference_status"]:
+            cursor.execute("SHOW COLUMNS FROM uniform_checks LIKE %s", (column,))
+            if not cursor.fetchone():
+                cursor.execute(f"ALTER TABLE uniform_checks ADD COLUMN {column} VARCHAR(16)")
+        
+        # Indexes behind the per-student and per-day check_time range queries; built online on large tables
+        for index, columns in [
+            ("idx_student_time", "student_id, check_time"),
+            ("idx_time_compliance", "check_time, overall_compliance")
+        ]:
+            cursor.execute("SHOW INDEX FROM uniform_checks WHERE Key_name = %s", (index,))
+            if not cursor.fetchone():
+                cursor.execute(
+                    f"ALTER TABLE uniform_checks ADD INDEX {index} ({columns}), ALGORITHM=INPLACE, LOCK=NONE"
+                )
+        
         connection.commit()
+        
+        # Per-day and per-student-day counters the reports read instead of raw checks
+        create_rollup_table(connection)
         print("Table created successfully!")
         
     except Exception as e:
@@ -90,15 +182,11 @@ def create_uniform_table():
         connection.close()
 
 
-def verify_login(username: str, password: str):
+async def verify_login(username: str, password: str):
     """Verify user credentials"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         query = "SELECT id, student_name, username FROM students WHERE username=%s AND password=%s"
-        cursor.execute(query, (username, password))
-        result = cursor.fetchone()
+        result = await db.fetchone(query, (username, password))
         
         if result:
             return {"id": result[0], "name": result[1], "username": result[2]}
@@ -107,27 +195,80 @@ def verify_login(username: str, password: str):
     except Exception as e:
         print(f"Login error: {e}")
         return None
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def verify_face_with_llm(current_image_path: str, reference_image_path: str):
+async def get_student_by_username(username: str):
+    """Look up a student by username (used after photo identification)"""
+    try:
+        query = "SELECT id, student_name, username FROM students WHERE username=%s"
+        result = await db.fetchone(query, (username,))
+        
+        if result:
+            return {"id": result[0], "name": result[1], "username": result[2]}
+        return None
+        
+    except Exception as e:
+        print(f"Error fetching student: {e}")
+        return None
+
+
+def rebuild_face_index():
+    """Rebuild the identification index from every reference embedding"""
+    items = []
+    for username in list(reference_store.mapping):
+        embedding = face_verifier.reference_embedding(username)
+        if embedding is not None:
+            items.append((username, embedding))
+    
+    face_index.rebuild(items)
+    print(f"Face index built with {len(items)} students")
+    return len(items)
+
+
+def identify_student(image_path: str):
+    """Find the enrolled student in a photo; returns (username or None, match details)"""
+    if face_verifier.embedder is None:
+        return None, {"reason": "unavailable"}
+    
+    try:
+        embedding = face_verifier.embed(image_path)
+    except Exception as e:
+        print(f"Error computing face embedding: {e}")
+        return None, {"reason": "unreadable"}
+    
+    if embedding is None:
+        return None, {"reason": "no_face"}
+    
+    threshold = min(IDENTIFY_MAX_DISTANCE, face_verifier.threshold)
+    matches = face_index.search(embedding, k=2)
+    if not matches or matches[0][1] > threshold:
+        return None, {"reason": "no_match", "distance": matches[0][1] if matches else None}
+    
+    username, distance = matches[0]
+    if len(matches) > 1 and matches[1][1] - distance < IDENTIFY_MIN_MARGIN:
+        return None, {"reason": "ambiguous", "distance": distance}
+    
+    return username, {
+        "same_person": True,
+        "distance": distance,
+        "threshold": threshold,
+        "verifier": f"{face_verifier.embedder.name}-index"
+    }
+
+
+async def verify_face_with_llm(current_image_path: str, reference_image_url: str):
     """Verify if the two faces are the same person using LLM"""
     try:
-        # Read both images
+        # Reference comes pre-encoded from the reference store
         with open(current_image_path, "rb") as f:
             current_img_b64 = base64.b64encode(f.read()).decode()
         
-        with open(reference_image_path, "rb") as f:
-            reference_img_b64 = base64.b64encode(f.read()).decode()
-        
         prompt = """Compare these two images and determine if they show the same person.
 Look at facial features, structure, and characteristics.
 Respond ONLY in JSON format:
 {"same_person": true/false, "confidence": "high/medium/low"}"""
 
-        response = llm.invoke([
+        response = await invoke_llm(llm, [
             {
                 "role": "user",
                 "content": [
@@ -135,7 +276,7 @@ Respond ONLY in JSON format:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{reference_img_b64}",
+                            "url": reference_image_url,
                             "detail": "high"
                         }
                     },
@@ -143,7 +284,7 @@ Respond ONLY in JSON format:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{current_img_b64}",
+                            "url": f"data:{image_mime(current_image_path)};base64,{current_img_b64}",
                             "detail": "high"
                         }
                     }
@@ -168,7 +309,18 @@ Respond ONLY in JSON format:
         return {"same_person": False, "confidence": "low", "error": str(e)}
 
 
-def check_uniform_with_llm(image_path: str):
+async def verify_face(username: str, current_image_path: str, reference_image_url: str):
+    """Verify the face locally against the precomputed embedding, falling back to the LLM"""
+    if FACE_VERIFIER == "local":
+        result = await asyncio.to_thread(face_verifier.verify, username, current_image_path)
+        if result is not None:
+            return result
+        print(f"Local face verification undecided for {username}, asking the LLM")
+    
+    return await verify_face_with_llm(current_image_path, reference_image_url)
+
+
+async def check_uniform_with_llm(image_path: str):
     """Check uniform using LLM - includes beard detection"""
     try:
         with open(image_path, "rb") as f:
@@ -178,7 +330,7 @@ def check_uniform_with_llm(image_path: str):
 Respond ONLY in JSON:
 {"black_blazer_or_suit": {"present": true/false}, "tie": {"present": true/false}, "white_shirt": {"present": true/false}, "id_card": {"present": true/false}, "beard": {"present": true/false}, "overall_compliance": true/false}"""
 
-        response = llm.invoke([
+        response = await invoke_llm(llm, [
             {
                 "role": "user",
                 "content": [
@@ -186,7 +338,7 @@ Respond ONLY in JSON:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_b64}"
+                            "url": f"data:{image_mime(image_path)};base64,{image_b64}"
                         }
                     }
                 ]
@@ -210,48 +362,370 @@ Respond ONLY in JSON:
         return {"error": str(e)}
 
 
-def save_uniform_check(student_id: int, student_name: str, results: dict, image_path: str, face_verified: bool):
-    """Save uniform check results to database"""
+async def check_uniform_batch_with_llm(image_paths: list):
+    """Check uniforms for several photos in one LLM call; returns one result per photo"""
+    if len(image_paths) == 1:
+        return [await check_uniform_with_llm(image_paths[0])]
+    
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        content = [{"type": "text", "text": f"""You are given {len(image_paths)} photos, numbered in order.
+For each photo check if wearing: blazer or suit, tie, white shirt, ID card. Also check if person has a beard.
+Respond ONLY with a JSON array of {len(image_paths)} objects, one per photo in the same order:
+[{{"black_blazer_or_suit": {{"present": true/false}}, "tie": {{"present": true/false}}, "white_shirt": {{"present": true/false}}, "id_card": {{"present": true/false}}, "beard": {{"present": true/false}}, "overall_compliance": true/false}}]"""}]
         
-        query = """
-        INSERT INTO uniform_checks 
-        (student_id, student_name, check_time, black_blazer_or_suit, tie, 
-         white_shirt, id_card, overall_compliance, image_path, face_verified)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        for number, image_path in enumerate(image_paths, start=1):
+            with open(image_path, "rb") as f:
+                image_b64 = base64.b64encode(f.read()).decode()
+            content.append({"type": "text", "text": f"Photo {number}:"})
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{image_mime(image_path)};base64,{image_b64}"
+                }
+            })
+        
+        # Room for one JSON object per photo
+        response = await invoke_llm(llm, [{"role": "user", "content": content}], max_tokens=200 * len(image_paths))
+        
+        # Parse JSON array response
+        response_text = response.content
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        
+        if start_idx != -1 and end_idx > start_idx:
+            results = json.loads(response_text[start_idx:end_idx])
+            if len(results) == len(image_paths):
+                return results
+        error = "Could not parse batch response"
+        
+    except Exception as e:
+        print(f"Error checking uniform batch: {e}")
+        error = str(e)
+    
+    return [{"error": error} for _ in image_paths]
+
+
+# Peak-time batching of uniform checks into multi-image requests (UNIFORM_BATCHING=1)
+uniform_batcher = MicroBatcher(check_uniform_batch_with_llm)
+
+
+async def check_uniform_cached(student_id: int, image_path: str):
+    """Check uniform, reusing a recent result for a near-identical frame from the same student"""
+    phash = await asyncio.to_thread(perceptual_hash, image_path)
+    
+    cached = uniform_cache.get(student_id, phash)
+    if cached is not None:
+        print(f"Uniform cache hit for student {student_id}")
+        return cached
+    
+    if UNIFORM_BATCHING:
+        results = await uniform_batcher.submit(image_path)
+    else:
+        results = await check_uniform_with_llm(image_path)
+    
+    # Only successful classifications are worth reusing
+    if "error" not in results:
+        uniform_cache.put(student_id, phash, results)
+    return results
+
+
+async def check_identity_and_uniform_with_llm(current_image_path: str, reference_image_url: str):
+    """Verify face and check uniform with a single LLM call (combined mode)"""
+    try:
+        with open(current_image_path, "rb") as f:
+            current_img_b64 = base64.b64encode(f.read()).decode()
+        
+        prompt = """The first image is the registered reference photo, the second is the current photo.
+Determine if they show the same person. Look at facial features, structure, and characteristics.
+In the current photo, check if wearing: blazer or suit, tie, white shirt, ID card. Also check if person has a beard.
+Respond ONLY in JSON:
+{"same_person": true/false, "confidence": "high/medium/low", "black_blazer_or_suit": {"present": true/false}, "tie": {"present": true/false}, "white_shirt": {"present": true/false}, "id_card": {"present": true/false}, "beard": {"present": true/false}, "overall_compliance": true/false}"""
+
+        response = await invoke_llm(llm, [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": reference_image_url,
+                            "detail": "high"
+                        }
+                    },
+                    {"type": "text", "text": "Reference image above. Current image below:"},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{image_mime(current_image_path)};base64,{current_img_b64}",
+                            "detail": "high"
+                        }
+                    }
+                ]
+            }
+        ])
+        
+        # Parse JSON response
+        response_text = response.content
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
+        
+        if start_idx != -1 and end_idx > start_idx:
+            json_str = response_text[start_idx:end_idx]
+            result = json.loads(json_str)
+            
+            # Split into the same shapes the two-call path returns
+            face_result = {
+                "same_person": result.pop("same_person", False),
+                "confidence": result.pop("confidence", "low")
+            }
+            return face_result, result
+        else:
+            error = "Could not parse response"
+            
+    except Exception as e:
+        print(f"Error in combined check: {e}")
+        error = str(e)
+    
+    return {"same_person": False, "confidence": "low", "error": error}, {"error": error}
+
+
+async def check_uniform_cascade(student_id: int, image_path: str):
+    """Decide clearly compliant frames locally, escalating the rest to the LLM; returns (results, stage)"""
+    if CASCADE_ENABLED:
+        local_results, confident = await asyncio.to_thread(uniform_classifier.classify, image_path)
+        if confident:
+            return local_results, "local"
+    
+    return await check_uniform_cached(student_id, image_path), "llm"
+
+
+UNIFORM_CHECK_INSERT = """
+    INSERT INTO uniform_checks 
+    (student_id, student_name, check_time, black_blazer_or_suit, tie, 
+     white_shirt, id_card, overall_compliance, image_path, face_verified, decision_stage, inference_status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+async def insert_uniform_checks(rows: list):
+    """Write uniform check rows with one multi-row INSERT and add them to the daily rollup, in one transaction"""
+    await insert_checks(db, UNIFORM_CHECK_INSERT, rows)
+
+
+# Optional group commit of uniform check rows (WRITE_BEHIND=sync|async)
+check_writer = WriteBehindBuffer(
+    insert_uniform_checks, permanent_errors=(pymysql.err.IntegrityError, pymysql.err.DataError)
+)
+
+
+async def save_uniform_check(student_id: int, student_name: str, results: dict, image_path: str, face_verified: bool,
+                             decision_stage: str = "llm"):
+    """Save uniform check results to database"""
+    try:
+        # A failed model call is stored as pending (NULL items), never as non-compliant
+        if "error" in results:
+            items = [None] * 5
+            inference_status = "pending"
+        else:
+            items = [
+                results.get("black_blazer_or_suit", {}).get("present", False),
+                results.get("tie", {}).get("present", False),
+                results.get("white_shirt", {}).get("present", False),
+                results.get("id_card", {}).get("present", False),
+                results.get("overall_compliance", False)
+            ]
+            inference_status = "ok"
         
         values = (
             student_id,
             student_name,
             datetime.now(),
-            results.get("black_blazer_or_suit", {}).get("present", False),
-            results.get("tie", {}).get("present", False),
-            results.get("white_shirt", {}).get("present", False),
-            results.get("id_card", {}).get("present", False),
-            results.get("overall_compliance", False),
+            *items,
             image_path,
-            face_verified
+            face_verified,
+            decision_stage,
+            inference_status
         )
         
-        cursor.execute(query, values)
-        connection.commit()
+        if check_writer.mode == "off":
+            await insert_uniform_checks([values])
+        else:
+            await check_writer.add(values)
         return True
         
     except Exception as e:
         print(f"Error saving check: {e}")
         return False
+
+
+async def run_uniform_check(user: dict, filepath: str, identification: dict = None):
+    """Verify the face and check the uniform on a stored upload, save it and build the response"""
+    username = user.get('username')
+    
+    # Downscaled, re-encoded copy is what gets sent to the model
+    model_path = await normalize_upload(filepath)
+    if not KEEP_ORIGINAL_UPLOADS:
+        filepath = model_path
+    
+    face_verified = False
+    face_verification_result = None
+    results = None
+    decision_stage = "llm"
+    reference_url = None
+    
+    # Check if user has a reference image for face verification
+    if identification is not None:
+        # Already matched by identify_student; no second verification
+        face_verification_result = identification
+    elif username in reference_store:
+        reference_url = reference_store.get(username)
+        
+        # Check if reference image exists
+        if reference_url is None:
+            print(f"Reference image not found for {username} at {reference_store.path_for(username)}")
+            # User has entry but image missing - treat as no verification needed
+    else:
+        # User not in dict - skip face verification, proceed with uniform check
+        print(f"No face verification required for {username}")
+    
+    # Combined mode only applies to the LLM verifier; local verification is cheaper on its own
+    combined = bool(reference_url) and CHECK_MODE == "combined" and FACE_VERIFIER != "local"
+    
+    # Reject blurry, dark or empty frames locally so the kiosk can recapture
+    if PRESCREEN_ENABLED:
+        model_calls = 2 if reference_url and not combined and FACE_VERIFIER != "local" else 1
+        screen = await asyncio.to_thread(frame_prescreen.screen, model_path, model_calls)
+        if not screen["ok"]:
+            return {
+                "success": False,
+                "error": "Unusable photo",
+                "reason": screen["reason"],
+                "message": screen["message"],
+                "image_url": f"/{filepath}"
+            }
+    
+    check_start = time.perf_counter()
+    
+    if combined:
+        print(f"Performing combined face and uniform check for {username}")
+        face_verification_result, results = await check_identity_and_uniform_with_llm(model_path, reference_url)
+        face_verified = face_verification_result.get("same_person", False)
+    else:
+        # Start the uniform check right away so it overlaps with face verification
+        uniform_task = asyncio.create_task(check_uniform_cascade(user['id'], model_path))
+        
+        try:
+            if reference_url:
+                print(f"Performing face verification for {username}")
+                face_verification_result = await verify_face(username, model_path, reference_url)
+                face_verified = face_verification_result.get("same_person", False)
+            else:
+                face_verified = True
+            
+            # Uniform check with LLM (includes beard detection)
+            if face_verified:
+                results, decision_stage = await uniform_task
+        finally:
+            # Drop the uniform check if verification failed or the request was abandoned
+            if not uniform_task.done():
+                uniform_task.cancel()
+    
+    check_mode = ("combined" if combined else "separate") if reference_url else "uniform_only"
+    if identification is not None:
+        check_mode = "identified"
+    print(f"{check_mode} check for {username} took {time.perf_counter() - check_start:.2f}s")
+    
+    # Verification itself failed (model unreachable): don't report a mismatch
+    if not face_verified and face_verification_result and "error" in face_verification_result:
+        return {
+            "success": False,
+            "error": "Face verification unavailable",
+            "message": "Face verification is busy right now. Please try again shortly.",
+            "face_verification": face_verification_result,
+            "check_mode": check_mode,
+            "image_url": f"/{filepath}"
+        }
+    
+    # If face verification fails, return error
+    if not face_verified:
+        return {
+            "success": False,
+            "error": "Face verification failed",
+            "message": "The person in the image does not match the registered user",
+            "face_verification": face_verification_result,
+            "check_mode": check_mode,
+            "image_url": f"/{filepath}"
+        }
+    
+    # Save to database with face verification status
+    saved = await save_uniform_check(user['id'], user['name'], results, filepath, face_verified, decision_stage)
+    
+    # Not recorded (with WRITE_BEHIND=sync this includes a failed flush): don't report success.
+    # Raised rather than returned so an Idempotency-Key retry runs the check again.
+    if not saved:
+        raise HTTPException(status_code=503, detail="Your check could not be saved, please try again")
+    
+    # The model could not be reached: the check is saved as pending, not as a violation
+    if "error" in results:
+        return {
+            "success": False,
+            "error": "Uniform check pending",
+            "message": "The uniform checker is busy right now. Your check was recorded as pending; please try again shortly.",
+            "inference_status": "pending",
+            "image_url": f"/{filepath}"
+        }
+    
+    # Return results including face verification info
+    return {
+        "success": True,
+        "face_verified": face_verified,
+        "face_verification_result": face_verification_result,
+        "results": results,
+        "decision_stage": decision_stage,
+        "check_mode": check_mode,
+        "image_url": f"/{filepath}"
+    }
+
+
+async def run_check_job(payload: dict):
+    """Run a check the check policy already admitted (at submission or identification) and record its outcome"""
+    user = payload["user"]
+    response = None
+    try:
+        response = await run_uniform_check(user, payload["filepath"], payload.get("identification"))
+        return response
     finally:
-        cursor.close()
-        connection.close()
+        check_policy.finish(user['id'], response)
+
+
+# Job mode: checks queued by /check-uniform/jobs and run by a bounded worker pool
+check_jobs = CheckJobQueue(run_check_job)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database table on startup"""
+    """Initialize database table, reference images and job workers on startup"""
+    db_pool.fill()
     create_uniform_table()
+    await db.fill()
+    reference_store.load_all()
+    if FACE_VERIFIER == "local":
+        await asyncio.to_thread(face_verifier.precompute_all)
+    if IDENTIFY_ENABLED:
+        await asyncio.to_thread(rebuild_face_index)
+    check_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop job workers and close pooled model and database connections"""
+    await check_jobs.stop()
+    await check_writer.close()
+    db_pool.close()
+    await db.close()
+    if hasattr(llm, "aclose"):
+        await llm.aclose()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -263,7 +737,7 @@ async def login_page(request: Request):
 @app.post("/login")
 async def login(username: str = Form(...), password: str = Form(...)):
     """Handle login"""
-    user = verify_login(username, password)
+    user = await verify_login(username, password)
     
     if user:
         session_id = f"{user['id']}_{datetime.now().timestamp()}"
@@ -300,71 +774,239 @@ async def dashboard(request: Request, session: str):
 @app.post("/check-uniform")
 async def check_uniform(
     session: str = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    idempotency_key: str = Header(None)
 ):
     """Process uniform check with face verification"""
     if session not in active_sessions:
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     user = active_sessions[session]
-    username = user.get('username')
     
-    # Save uploaded image
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"uniform_{user['id']}_{timestamp}.jpg"
-    filepath = f"static/uploads/{filename}"
+    async def run_check():
+        # Cooldown, daily limit and same-day reuse are decided before the upload is stored or a slot taken
+        blocked = check_policy.begin(user['id'])
+        if blocked is not None:
+            return blocked
+        
+        response = None
+        try:
+            async with admission.admit():
+                # Stream the upload to content-addressed storage (identical images are stored once)
+                image_hash, filepath = await save_upload(image)
+                
+                response = await run_uniform_check(user, filepath)
+                return response
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many checks in progress, please try again",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        finally:
+            check_policy.finish(user['id'], response)
     
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    # A resubmission with the same Idempotency-Key gets the first run's result
+    result, replayed = await idempotency.run(("check", user['id']), idempotency_key, run_check)
+    return JSONResponse(result, headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+
+@app.post("/check-uniform/jobs")
+async def submit_uniform_check_job(
+    session: str = Form(...),
+    image: UploadFile = File(...),
+    idempotency_key: str = Header(None)
+):
+    """Queue a uniform check and return a job id immediately"""
+    if session not in active_sessions:
+        raise HTTPException(status_code=401, detail="Unauthorized")
     
-    face_verified = False
-    face_verification_result = None
+    user = active_sessions[session]
     
-    # Check if user has a reference image for face verification
-    if username in USER_REFERENCE_IMAGES:
-        reference_image = USER_REFERENCE_IMAGES[username]
-        reference_path = f"static/reference_images/{reference_image}"
+    async def submit():
+        # Decided before the upload is stored; a blocked or reused check is answered without a job
+        blocked = check_policy.begin(user['id'])
+        if blocked is not None:
+            return blocked
         
-        # Check if reference image exists
-        if os.path.exists(reference_path):
-            print(f"Performing face verification for {username}")
-            face_verification_result = verify_face_with_llm(filepath, reference_path)
-            face_verified = face_verification_result.get("same_person", False)
-            
-            # If face verification fails, return error
-            if not face_verified:
-                return JSONResponse({
-                    "success": False,
-                    "error": "Face verification failed",
-                    "message": "The person in the image does not match the registered user",
-                    "face_verification": face_verification_result,
-                    "image_url": f"/static/uploads/{filename}"
-                })
-        else:
-            print(f"Reference image not found for {username} at {reference_path}")
-            # User has entry but image missing - treat as no verification needed
-            face_verified = True
-    else:
-        # User not in dict - skip face verification, proceed with uniform check
-        print(f"No face verification required for {username}")
-        face_verified = True
+        queued = False
+        try:
+            image_hash, filepath = await save_upload(image)
+            job_id = check_jobs.submit(user['id'], {"user": user, "filepath": filepath})["id"]
+            queued = True
+            return job_id
+        except JobQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many checks queued, please try again",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        finally:
+            # Once queued, run_check_job() records the outcome
+            if not queued:
+                check_policy.finish(user['id'], None)
     
-    # Check uniform with LLM (includes beard detection)
-    results = check_uniform_with_llm(filepath)
+    # A resubmission with the same Idempotency-Key attaches to the job it already created
+    job_id, replayed = await idempotency.run(("job", user['id']), idempotency_key, submit)
+    if isinstance(job_id, dict):
+        return JSONResponse(job_id, headers={"Idempotent-Replayed": "true"} if replayed else None)
     
-    # Save to database with face verification status
-    save_uniform_check(user['id'], user['name'], results, filepath, face_verified)
+    job = check_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=410, detail="Check expired, please submit again")
     
-    # Return results including face verification info
+    return JSONResponse(check_jobs.public(job), status_code=202,
+                        headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+
+def get_session_job(session: str, job_id: str):
+    """Look up a job that belongs to the session's user"""
+    if session not in active_sessions:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    job = check_jobs.get(job_id)
+    if job is None or job["owner"] != active_sessions[session]['id']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/check-uniform/jobs/{job_id}")
+async def get_uniform_check_job(job_id: str, session: str):
+    """Poll the status of a queued uniform check"""
+    job = get_session_job(session, job_id)
+    return JSONResponse(check_jobs.public(job))
+
+
+@app.get("/check-uniform/jobs/{job_id}/events")
+async def stream_uniform_check_job(job_id: str, session: str):
+    """Push job status changes as Server-Sent Events until the check finishes"""
+    job = get_session_job(session, job_id)
+    
+    async def events():
+        while True:
+            changed = check_jobs.watch(job)
+            state = check_jobs.public(job)
+            yield f"event: {state['status']}\ndata: {json.dumps(state)}\n\n"
+            
+            if state["status"] in ("done", "failed"):
+                break
+            if not await check_jobs.wait_for_change(changed, 15):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose runtime counters"""
     return JSONResponse({
-        "success": True,
-        "face_verified": face_verified,
-        "face_verification_result": face_verification_result,
-        "results": results,
-        "image_url": f"/static/uploads/{filename}"
+        "prescreen": frame_prescreen.stats(),
+        "cascade": uniform_classifier.stats(),
+        "admission": admission.stats(),
+        "idempotency": idempotency.stats(),
+        "check_policy": check_policy.stats(),
+        "db_pool": db_pool.stats(),
+        "db": db.stats(),
+        "write_behind": check_writer.stats(),
+        "model": llm.stats(),
+        "uniform_cache": uniform_cache.stats(),
+        "uniform_batching": uniform_batcher.stats(),
+        "reference_store": reference_store.stats(),
+        "face_verifier": face_verifier.stats(),
+        "face_index": face_index.stats(),
+        "check_jobs": check_jobs.stats()
     })
 
 
+@app.post("/references/enroll")
+async def enroll_reference(
+    username: str = Form(...),
+    teacher_username: str = Form(...),
+    teacher_password: str = Form(...),
+    image: UploadFile = File(...)
+):
+    """Add or replace a student's reference image for face verification"""
+    if teacher_username != TEACHER_USERNAME or teacher_password != TEACHER_PASSWORD:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    image_bytes = await image.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image")
+    
+    try:
+        await asyncio.to_thread(reference_store.enroll, username, image_bytes)
+        if FACE_VERIFIER == "local" or IDENTIFY_ENABLED:
+            embedding = await asyncio.to_thread(face_verifier.reference_embedding, username)
+            if IDENTIFY_ENABLED and embedding is not None:
+                face_index.add(username, embedding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONResponse({"success": True, "username": username})
+
+
+@app.post("/references/index/rebuild")
+async def rebuild_reference_index(
+    teacher_username: str = Form(...),
+    teacher_password: str = Form(...)
+):
+    """Rebuild the identification index from all reference images"""
+    if teacher_username != TEACHER_USERNAME or teacher_password != TEACHER_PASSWORD:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    count = await asyncio.to_thread(rebuild_face_index)
+    return JSONResponse({"success": True, "indexed": count})
+
+
+@app.post("/identify-and-check")
+async def identify_and_check(
+    request: Request,
+    image: UploadFile = File(...),
+    idempotency_key: str = Header(None),
+    kiosk_id: str = Header(None)
+):
+    """Kiosk mode: identify the student from the photo alone, then check the uniform"""
+    if not IDENTIFY_ENABLED:
+        raise HTTPException(status_code=404, detail="Identification mode is disabled")
+    
+    async def run_check():
+        try:
+            async with admission.admit():
+                image_hash, filepath = await save_upload(image)
+                model_path = await normalize_upload(filepath)
+                
+                username, match = await asyncio.to_thread(identify_student, model_path)
+                user = await get_student_by_username(username) if username else None
+                if user is None:
+                    return {
+                        "success": False,
+                        "error": "Student not identified",
+                        "message": "We could not recognise you. Please log in to check your uniform.",
+                        "identification": match,
+                        "image_url": f"/{model_path if not KEEP_ORIGINAL_UPLOADS else filepath}"
+                    }
+                
+                # The student is only known once identified, so the check policy applies from here
+                result = check_policy.begin(user['id'])
+                if result is None:
+                    result = await run_check_job({"user": user, "filepath": filepath, "identification": match})
+                # Unauthenticated endpoint: greet by name, never echo the student's id or username
+                result["student"] = {"name": user["name"]}
+                return result
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many checks in progress, please try again",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+    
+    # The kiosk has no session: keys are scoped to the kiosk (its Kiosk-Id header, else its address)
+    # so two kiosks that happen to send the same key never share a result
+    kiosk = kiosk_id or (request.client.host if request.client else None)
+    result, replayed = await idempotency.run(("kiosk", kiosk), idempotency_key, run_check)
+    return JSONResponse(result, headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+
 @app.get("/logout")
 async def logout(session: str):
     """Logout user"""
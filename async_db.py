@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+import pymysql
+
+from db_pool import (
+    DB_POOL_MAX_LIFETIME, DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE, DB_POOL_PING_AFTER, DB_POOL_TIMEOUT, PoolTimeout
+)
+
+
+def aiomysql_config(config: dict):
+    """Translate a pymysql DB_CONFIG into aiomysql.connect() arguments"""
+    kwargs = dict(config)
+    if "database" in kwargs:
+        kwargs["db"] = kwargs.pop("database")
+    if kwargs.get("cursorclass") is pymysql.cursors.DictCursor:
+        kwargs["cursorclass"] = aiomysql.DictCursor
+    elif "cursorclass" in kwargs:
+        kwargs.pop("cursorclass")
+    # Every statement commits on its own, so a returned connection never holds an open transaction
+    kwargs["autocommit"] = True
+    return kwargs
+
+
+class AsyncPool:
+    """aiomysql connection pool for one DB config, opened lazily on the running event loop"""
+
+    def __init__(self, config: dict, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, ping_after=DB_POOL_PING_AFTER, timeout=DB_POOL_TIMEOUT):
+        self.config = aiomysql_config(config)
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.exhausted = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+        self.queries = 0
+        self._total_query = 0.0
+
+    async def open(self):
+        """Create the pool and its min_size connections; later calls are no-ops"""
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        minsize=self.min_size,
+                        maxsize=self.max_size,
+                        pool_recycle=int(self.max_lifetime) if self.max_lifetime else -1,
+                        **self.config
+                    )
+        return self._pool
+
+    async def fill(self):
+        """open() from app startup; a database that is down is reported, not fatal"""
+        try:
+            await self.open()
+        except Exception as e:
+            print(f"Error filling connection pool: {e}")
+
+    async def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.close()
+            await pool.wait_closed()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for several statements; it goes back to the pool on exit"""
+        pool = await self.open()
+        start = time.monotonic()
+        if not pool.freesize and pool.size >= pool.maxsize:
+            self.waits += 1
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.exhausted += 1
+            raise PoolTimeout(2013, f"No database connection free within {self.timeout}s ({self.max_size} in use)")
+
+        try:
+            # Reconnects in place if the server dropped a connection that sat idle
+            if asyncio.get_running_loop().time() - conn.last_usage >= self.ping_after:
+                await conn.ping()
+            wait = time.monotonic() - start
+            self.checkouts += 1
+            self._total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            yield conn
+        finally:
+            pool.release(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Borrow a connection inside BEGIN ... COMMIT; the work is rolled back if the block raises"""
+        async with self.connection() as conn:
+            await conn.begin()
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    async def _run(self, query: str, args, fetch):
+        start = time.monotonic()
+        async with self.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, args)
+                result = await fetch(cursor)
+        self.queries += 1
+        self._total_query += time.monotonic() - start
+        return result
+
+    async def fetchall(self, query: str, args=None):
+        return await self._run(query, args, lambda cursor: cursor.fetchall())
+
+    async def fetchone(self, query: str, args=None):
+        return await self._run(query, args, lambda cursor: cursor.fetchone())
+
+    async def execute(self, query: str, args=None):
+        """Run a write and return the new row id (or 0)"""
+        async def lastrowid(cursor):
+            return cursor.lastrowid
+        return await self._run(query, args, lastrowid)
+
+    async def executemany(self, query: str, rows):
+        """Run an INSERT for many rows; pymysql turns it into one multi-row statement"""
+        start = time.monotonic()
+        async with self.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(query, rows)
+                result = cursor.rowcount
+        self.queries += 1
+        self._total_query += time.monotonic() - start
+        return result
+
+    def stats(self):
+        pool = self._pool
+        return {
+            "open": pool.size if pool else 0,
+            "idle": pool.freesize if pool else 0,
+            "in_use": pool.size - pool.freesize if pool else 0,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "exhausted": self.exhausted,
+            "avg_wait_ms": round(self._total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "queries": self.queries,
+            "avg_query_ms": round(self._total_query / self.queries * 1000, 2) if self.queries else 0.0
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_async_pool(config: dict):
+    """The process-wide async pool for this DB config"""
+    key = tuple(sorted(config.items(), key=lambda item: item[0]))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = AsyncPool(config)
+        return _pools[key]
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+
+# Send uniform checks to the model in multi-image batches
+UNIFORM_BATCHING = os.getenv("UNIFORM_BATCHING", "0") == "1"
+
+# How long the first image in a batch may wait for company, and the batch size cap
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "300"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "4"))
+
+
+class MicroBatcher:
+    """Collects submissions for up to window_ms or max_size items and runs them as one batch"""
+
+    def __init__(self, batch_fn, window_ms=BATCH_WINDOW_MS, max_size=BATCH_MAX_SIZE):
+        self.batch_fn = batch_fn
+        self.window_ms = window_ms
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+        # Strong references to running flushes; the event loop only keeps weak ones
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self._total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    async def submit(self, item):
+        """Add an item to the current batch and wait for its own result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        now = time.monotonic()
+        for _, _, queued_at in batch:
+            wait = now - queued_at
+            self._total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+        self.batches += 1
+        self.items += len(batch)
+        if len(batch) == self.max_size:
+            self.full_batches += 1
+
+        try:
+            results = await self.batch_fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """Batch fill and the queueing latency batching adds"""
+        return {
+            "window_ms": self.window_ms,
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avg_fill": round(self.items / (self.batches * self.max_size), 3) if self.batches else 0.0,
+            "full_batches": self.full_batches,
+            "avg_queue_wait_ms": round(self._total_queue_wait / self.items * 1000, 1) if self.items else 0.0,
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 1)
+        }
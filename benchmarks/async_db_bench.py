@@ -0,0 +1,162 @@
+"""
+Latency under parallel load: blocking pymysql on the event loop versus the async pool.
+
+Sends requests at a fixed --rate (open loop, so they overlap) to the teacher
+dashboard's queries and the Student_attdentce attendance endpoints, first with
+every query run through the synchronous pool on the event loop thread (the old
+data path), then through async_db. Reports p50/p99 per endpoint, measured from
+each request's scheduled arrival. The dashboard is timed at the data layer
+(its data snapshot) because the installed Starlette rejects the teacher app's
+TemplateResponse call; the attendance endpoints go through the ASGI app.
+
+Needs the attendance database from DB_CONFIG to be reachable; override the host
+and credentials with the flags below. --student-id picks whose attendance is read.
+
+Run from the repository root:
+    python benchmarks/async_db_bench.py --requests 400 --rate 200
+    python benchmarks/async_db_bench.py --host db.internal --password secret --student-id 8
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The teacher app creates its template and static directories relative to the working directory
+os.chdir(os.path.join(ROOT, "teacher_login"))
+
+import httpx
+import pymysql
+
+from async_db import AsyncPool
+from db_pool import ConnectionPool
+
+
+class BlockingDB:
+    """The old data path: pooled pymysql queries run on the event loop thread"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _run(self, query, args, fetch):
+        connection = self.pool.connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, args)
+            return fetch(cursor)
+        finally:
+            connection.close()
+
+    async def fetchall(self, query, args=None):
+        return self._run(query, args, lambda cursor: cursor.fetchall())
+
+    async def fetchone(self, query, args=None):
+        return self._run(query, args, lambda cursor: cursor.fetchone())
+
+    async def execute(self, query, args=None):
+        return self._run(query, args, lambda cursor: cursor.lastrowid)
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def measure(teacher, attendance, args):
+    transport = httpx.ASGITransport(app=attendance.app)
+    latencies = {"dashboard": [], "attendance/today": [], "attendance/month": []}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def dashboard():
+            await teacher.dashboard_data.snapshot("dashboard")
+
+        async def endpoint(path):
+            response = await client.get(path)
+            response.raise_for_status()
+
+        calls = {
+            "dashboard": dashboard,
+            "attendance/today": lambda: endpoint(f"/api/attendance/today/{args.student_id}"),
+            "attendance/month": lambda: endpoint(f"/api/attendance/month/{args.student_id}")
+        }
+
+        async def one(i, due):
+            # Latency counts from the scheduled arrival, so time spent waiting on a blocked loop shows up
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            name = list(calls)[i % len(calls)]
+            await calls[name]()
+            latencies[name].append((time.perf_counter() - due) * 1000)
+
+        # Warm-up round so neither run is charged for opening connections
+        now = time.perf_counter()
+        await asyncio.gather(*(one(i, now) for i in range(len(calls))))
+        for values in latencies.values():
+            values.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, start + i / args.rate) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, elapsed
+
+
+async def run(args):
+    teacher = load("teacher_app", "teacher_login/app.py")
+    attendance = load("attendance_app", "Student_attdentce/app.py")
+
+    teacher_config = dict(teacher.DB_CONFIG)
+    attendance_config = dict(attendance.DB_CONFIG)
+    for key in ("host", "user", "password", "database"):
+        if getattr(args, key):
+            teacher_config[key] = attendance_config[key] = getattr(args, key)
+
+    # The helpers swallow database errors, so check the server is there before timing anything
+    try:
+        pymysql.connect(**teacher_config).close()
+    except pymysql.Error as e:
+        sys.exit(f"Cannot connect to MySQL at {teacher_config['host']}: {e}")
+
+    modes = [
+        ("blocking", BlockingDB(ConnectionPool(teacher_config, max_size=args.pool_size)),
+         BlockingDB(ConnectionPool(attendance_config, max_size=args.pool_size))),
+        ("async", AsyncPool(teacher_config, max_size=args.pool_size),
+         AsyncPool(attendance_config, max_size=args.pool_size))
+    ]
+    print(f"requests={args.requests} rate={args.rate}/s pool_size={args.pool_size}")
+    for mode, teacher_db, attendance_db in modes:
+        teacher.db = teacher_db
+        attendance.db = attendance_db
+        latencies, elapsed = await measure(teacher, attendance, args)
+        print(f"  {mode}: {args.requests / elapsed:.1f} req/s")
+        for name, values in latencies.items():
+            print(f"    {name:<17} p50={statistics.median(values):8.2f}ms  p99={percentile(values, 0.99):8.2f}ms")
+        if isinstance(teacher_db, AsyncPool):
+            print(f"    pool: {teacher_db.stats()}")
+            await teacher_db.close()
+            await attendance_db.close()
+        else:
+            teacher_db.pool.close()
+            attendance_db.pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=200, help="requests started per second")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--student-id", type=int, default=1)
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Throughput benchmark for /check-uniform under concurrent uploads.
+
+Starts the local fake chat-completions server (or the in-process stub with
+--backend stub), points the app's model client at it and fires concurrent
+uploads through the ASGI app. Database writes are disabled so only the request
+path and model call are timed.
+
+Run from the repository root:
+    python benchmarks/check_uniform_bench.py --app app --requests 64 --concurrency 16 --latency 1.0
+    python benchmarks/check_uniform_bench.py --backend stub --latency-dist lognormal:1.0,0.5 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import httpx
+
+from fake_model_server import start_server
+from model_backends import StubModel, create_llm
+from resilience import ResilientModel
+from result_cache import UniformResultCache
+
+def list_uploads():
+    """Every file currently under static/uploads"""
+    return {
+        os.path.join(directory, name)
+        for directory, _, names in os.walk("static/uploads")
+        for name in names
+    }
+
+
+async def run(args):
+    latency = args.latency_dist or f"fixed:{args.latency}"
+    module = importlib.import_module(args.app)
+    if args.backend == "stub":
+        server = None
+        stub = StubModel(latency, args.error_rate)
+        module.llm = ResilientModel(stub)
+    else:
+        server, base_url = start_server(latency=latency, error_rate=args.error_rate)
+        module.llm = ResilientModel(create_llm("bench", backend="fake", base_url=base_url))
+
+    async def skip_save(*args, **kwargs):
+        return True
+    module.save_uniform_check = skip_save
+    if not args.cache:
+        # Every upload is the same frame, so keep the result cache out of the measurement
+        module.uniform_cache = UniformResultCache(max_entries=0)
+    module.UNIFORM_BATCHING = args.batching
+
+    # One student per request, so the per-student check policy never turns a request away
+    sessions = [f"bench_session_{i}" for i in range(args.requests)]
+    for i, session in enumerate(sessions):
+        module.active_sessions[session] = {"id": i + 1, "name": f"Bench Student {i + 1}", "username": "bench"}
+    with open("static/uploads/uniform_2_20251117_101956.jpg", "rb") as f:
+        image = f.read()
+
+    uploads_before = list_uploads()
+    transport = httpx.ASGITransport(app=module.app)
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(session):
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/check-uniform",
+                    data={"session": session},
+                    files={"image": ("uniform.jpg", image, "image/jpeg")}
+                )
+                response.raise_for_status()
+                if not response.json().get("success"):
+                    failures.append(response.json().get("error"))
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(session) for session in sessions))
+        elapsed = time.perf_counter() - start
+
+    if server:
+        server.shutdown()
+    for path in list_uploads() - uploads_before:
+        os.remove(path)
+
+    latencies.sort()
+    print(f"app={args.app} backend={args.backend} requests={args.requests} concurrency={args.concurrency} "
+          f"model_latency={latency} error_rate={args.error_rate}")
+    ceiling = f" (serial ceiling {1 / args.latency:.2f} req/s)" if not args.latency_dist and args.latency else ""
+    print(f"  throughput: {args.requests / elapsed:.2f} req/s{ceiling}")
+    print(f"  p50: {latencies[len(latencies) // 2]:.3f}s  "
+          f"p99: {latencies[int(len(latencies) * 0.99) - 1]:.3f}s")
+    calls = server.calls if server else stub.calls
+    print(f"  upstream model calls: {calls}  failed checks: {len(failures)}")
+    print(f"  resilience: {module.llm.stats()}")
+    if args.batching:
+        print(f"  batching: {module.uniform_batcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="app", help="module to benchmark (app or app2)")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--backend", choices=["fake", "stub"], default="fake",
+                        help="local HTTP fake server or in-process stub")
+    parser.add_argument("--latency", type=float, default=1.0, help="fixed fake model latency in seconds")
+    parser.add_argument("--latency-dist", help="latency distribution instead, e.g. lognormal:1.0,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of model calls that fail")
+    parser.add_argument("--cache", action="store_true", help="leave the perceptual-hash result cache on")
+    parser.add_argument("--batching", action="store_true", help="batch uniform checks into multi-image calls")
+    asyncio.run(run(parser.parse_args()))
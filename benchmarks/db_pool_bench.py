@@ -0,0 +1,126 @@
+"""
+Teacher dashboard query latency with and without the shared connection pool.
+
+Runs the teacher dashboard's data snapshot (the queries behind each
+/teacher/dashboard view) from --concurrency worker threads, first opening a
+fresh MySQL connection per query, then with the pool from db_pool.py. The
+teacher helpers are async and normally run on async_db; here each worker
+drives them on its own event loop against the synchronous connections, so
+only connection handling differs between the two runs. Template rendering is
+left out. Needs the attendance database from DB_CONFIG to be reachable;
+override the host and credentials below.
+
+Run from the repository root:
+    python benchmarks/db_pool_bench.py --requests 300 --concurrency 8
+    python benchmarks/db_pool_bench.py --host db.internal --password secret --max-size 4
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The teacher app creates its template and static directories relative to the working directory
+os.chdir(os.path.join(ROOT, "teacher_login"))
+
+import pymysql
+
+from db_pool import ConnectionPool, DirectConnections
+
+
+class SyncDB:
+    """The async pool's query interface, run synchronously on a ConnectionPool or DirectConnections"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _run(self, query, args, fetch):
+        connection = self.pool.connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, args)
+            return fetch(cursor)
+        finally:
+            connection.close()
+
+    async def fetchall(self, query, args=None):
+        return self._run(query, args, lambda cursor: cursor.fetchall())
+
+    async def fetchone(self, query, args=None):
+        return self._run(query, args, lambda cursor: cursor.fetchone())
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def measure(module, pool, args):
+    module.db = SyncDB(pool)
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        # The queries behind one /teacher/dashboard view
+        asyncio.run(module.dashboard_data.snapshot("dashboard"))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # Warm-up view, so the pooled run isn't charged for opening its first connections
+    one(None)
+    latencies.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    return latencies, elapsed
+
+
+def run(args):
+    module = load("teacher_app", "teacher_login/app.py")
+
+    config = dict(module.DB_CONFIG)
+    for key in ("host", "user", "password", "database"):
+        if getattr(args, key):
+            config[key] = getattr(args, key)
+
+    # The app's helpers swallow database errors, so check the server is there before timing anything
+    try:
+        pymysql.connect(**config).close()
+    except pymysql.Error as e:
+        sys.exit(f"Cannot connect to MySQL at {config['host']}: {e}")
+
+    pooled = ConnectionPool(config, min_size=args.min_size, max_size=args.max_size)
+    for name, pool in [("per-call connect", DirectConnections(config)), ("pooled", pooled)]:
+        latencies, elapsed = measure(module, pool, args)
+        print(f"{name:>16}: {args.requests / elapsed:7.1f} views/s  p50={statistics.median(latencies):.2f}ms  "
+              f"p99={percentile(latencies, 0.99):.2f}ms  connections/view="
+              f"{pool.stats().get('created', pool.checkouts) / (args.requests + 1):.2f}")
+
+    print(f"  pool: {pooled.stats()}")
+    pooled.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--min-size", type=int, default=2)
+    parser.add_argument("--max-size", type=int, default=10)
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    run(parser.parse_args())
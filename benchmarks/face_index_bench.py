@@ -0,0 +1,70 @@
+"""
+Identification lookup latency versus gallery size.
+
+Fills a FaceIndex with random unit vectors (128-d like SFace) and times
+nearest-neighbour searches for a query that is a noisy copy of an enrolled
+embedding. It also reports the full rebuild time and the average incremental
+insert time at each size.
+
+Run from the repository root:
+    python benchmarks/face_index_bench.py --sizes 1000 10000 50000 --dim 128
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from face_index import FaceIndex
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(args):
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} queries={args.queries}")
+
+    for size in args.sizes:
+        gallery = rng.standard_normal((size, args.dim)).astype(np.float32)
+        labels = [f"student{i}" for i in range(size)]
+
+        index = FaceIndex()
+        start = time.perf_counter()
+        index.rebuild(zip(labels, gallery))
+        rebuild_ms = (time.perf_counter() - start) * 1000
+
+        incremental = FaceIndex()
+        inserts = min(size, 2000)
+        start = time.perf_counter()
+        for label, vector in zip(labels[:inserts], gallery[:inserts]):
+            incremental.add(label, vector)
+        insert_us = (time.perf_counter() - start) / inserts * 1e6
+
+        timings = []
+        correct = 0
+        for _ in range(args.queries):
+            target = int(rng.integers(size))
+            query = gallery[target] + 0.3 * rng.standard_normal(args.dim).astype(np.float32)
+            start = time.perf_counter()
+            matches = index.search(query, k=2)
+            timings.append((time.perf_counter() - start) * 1000)
+            correct += matches[0][0] == labels[target]
+
+        print(f"  gallery={size:>6}  p50={statistics.median(timings):.3f}ms  p99={percentile(timings, 0.99):.3f}ms"
+              f"  rebuild={rebuild_ms:.1f}ms  insert={insert_us:.1f}us  accuracy={correct / args.queries:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=500)
+    run(parser.parse_args())
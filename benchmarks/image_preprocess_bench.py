@@ -0,0 +1,96 @@
+"""
+Bytes sent and latency versus capture resolution, with and without normalization.
+
+For each resolution a synthetic webcam-like frame is generated. The script
+reports the raw upload size, the normalized size and the time to normalize.
+It also times one chat-completions POST of the base64 payload to a local fake
+endpoint with zero model latency, which isolates encoding and transfer cost.
+
+Run from the repository root:
+    python benchmarks/image_preprocess_bench.py --max-edge 1024 --quality 80
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import httpx
+from PIL import Image, ImageDraw, ImageFilter
+
+from fake_model_server import start_server
+from image_preprocess import normalize_image
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+
+def synthetic_frame(width: int, height: int):
+    """A JPEG with smooth regions, edges and sensor-like noise"""
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((width // 3, height // 4, 2 * width // 3, height), fill=(20, 20, 25))
+    draw.rectangle((width // 2 - width // 30, height // 4, width // 2 + width // 30, height), fill=(240, 240, 240))
+    draw.ellipse((width // 2 - width // 10, height // 20, width // 2 + width // 10, height // 3), fill=(200, 160, 130))
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    img = Image.blend(img, noise, 0.15).filter(ImageFilter.SMOOTH)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def post_payload(client: httpx.Client, base_url: str, data: bytes):
+    """Time one chat-completions request carrying the image as a data URL"""
+    start = time.perf_counter()
+    body = json.dumps({
+        "model": "fake",
+        "messages": [{
+            "role": "user",
+            "content": [{"type": "image_url", "image_url": {
+                "url": f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
+            }}]
+        }]
+    })
+    client.post(f"{base_url}/chat/completions", content=body,
+                headers={"Content-Type": "application/json"}).raise_for_status()
+    return time.perf_counter() - start, len(body)
+
+
+def main(args):
+    server, base_url = start_server()
+    print(f"max_edge={args.max_edge} format={args.format} quality={args.quality}")
+    print(f"{'resolution':>12} {'raw KB':>8} {'sent KB':>8} {'norm ms':>8} "
+          f"{'raw req ms':>10} {'norm req ms':>11} {'body saved':>10}")
+
+    with httpx.Client(timeout=None) as client:
+        for width, height in RESOLUTIONS:
+            raw = synthetic_frame(width, height)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                compact = normalize_image(raw, args.max_edge, args.format, args.quality)
+            normalize_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            raw_time, raw_body = post_payload(client, base_url, raw)
+            compact_time, compact_body = post_payload(client, base_url, compact)
+
+            resolution = f"{width}x{height}"
+            print(f"{resolution:>12} {len(raw) / 1024:>8.1f} {len(compact) / 1024:>8.1f} "
+                  f"{normalize_ms:>8.1f} {raw_time * 1000:>10.1f} {compact_time * 1000:>11.1f} "
+                  f"{1 - compact_body / raw_body:>10.0%}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-edge", type=int, default=1024)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "WEBP"])
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,78 @@
+"""
+Per-call client overhead: langchain ChatOpenAI versus the direct pooled client.
+
+Both clients call the local fake chat-completions server with zero model
+latency, so the measured time is client-side work (message conversion,
+serialisation, connection handling) plus the local round trip. Each call
+carries a base64 image of --image-kb kilobytes like a real uniform check.
+
+Run from the repository root:
+    python benchmarks/model_client_bench.py --calls 200 --concurrency 8 --image-kb 150
+"""
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fake_model_server import start_server
+from model_backends import create_llm
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def measure(llm, messages, calls, concurrency):
+    """Warm up, then time calls at the given concurrency"""
+    await llm.ainvoke(messages)
+    gate = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with gate:
+            start = time.perf_counter()
+            await llm.ainvoke(messages)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return timings, time.perf_counter() - start
+
+
+async def run(args):
+    server, base_url = start_server()
+    image_b64 = base64.b64encode(os.urandom(args.image_kb * 1024)).decode()
+    messages = [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "Check if wearing: blazer or suit, tie, white shirt, ID card."},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_b64}"}}
+        ]
+    }]
+
+    print(f"calls={args.calls} concurrency={args.concurrency} image={args.image_kb}KB")
+    for client in ("langchain", "direct"):
+        llm = create_llm("bench", backend="fake", base_url=base_url, client=client)
+        timings, elapsed = await measure(llm, messages, args.calls, args.concurrency)
+        print(f"  {client:>9}: mean={statistics.mean(timings):.2f}ms  p50={statistics.median(timings):.2f}ms  "
+              f"p99={percentile(timings, 0.99):.2f}ms  throughput={args.calls / elapsed:.0f} calls/s")
+        if hasattr(llm, "aclose"):
+            await llm.aclose()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--image-kb", type=int, default=150)
+    asyncio.run(run(parser.parse_args()))
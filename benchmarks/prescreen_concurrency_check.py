@@ -0,0 +1,64 @@
+"""
+Concurrency check for the local frame classifiers: results from many worker
+threads must match a sequential run exactly.
+
+The apps call FramePrescreen.screen and LocalUniformClassifier.classify through
+asyncio.to_thread, so each instance is used by several threads at once. Every
+image is screened/classified once sequentially, then --rounds more times from
+--threads threads, and any result that differs is reported. Exits 1 on a
+mismatch.
+
+Run from the repository root (the sample uploads are used by default):
+    python benchmarks/prescreen_concurrency_check.py --threads 8 --rounds 30
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from prescreen import FramePrescreen
+from uniform_cascade import LocalUniformClassifier
+
+
+def compare(name, run, images, threads, rounds):
+    """Count results from the thread pool that differ from the sequential run"""
+    expected = {path: run(path) for path in images}
+    jobs = [path for _ in range(rounds) for path in images]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(run, jobs))
+
+    mismatches = sum(1 for path, result in zip(jobs, results) if result != expected[path])
+    print(f"{name}: {len(jobs)} concurrent runs on {threads} threads, {mismatches} differ from sequential")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="frames to check (default: static/uploads/**/*.jpg)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    images = args.images or sorted(glob.glob("static/uploads/**/*.jpg", recursive=True))
+    if not images:
+        sys.exit("No images to check")
+
+    prescreen = FramePrescreen()
+    classifier = LocalUniformClassifier()
+
+    def screen(path):
+        result = prescreen.screen(path)
+        return result["reason"], result["metrics"]
+
+    mismatches = compare("prescreen", screen, images, args.threads, args.rounds)
+    mismatches += compare("uniform cascade", classifier.classify, images, args.threads, args.rounds)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+EXPLAIN regression check and timing for the uniform_checks report queries.
+
+Loads --rows synthetic checks (default 10M) into a scratch database, applies the
+schema migration from create_uniform_table (indexes included), then:
+
+1. Captures the exact SQL the teacher dashboard/report helpers and the
+   Student_attdentce attendance endpoints send, and EXPLAINs each one. Any
+   query that full-scans uniform_checks (type ALL) is a regression and makes
+   the script exit non-zero.
+2. Times today's checks, today's statistics and a student's month with the
+   old function-wrapped predicates (DATE(), YEAR()/MONTH()) versus the
+   half-open ranges the code now uses.
+
+The data is reused between runs once loaded. The optimizer only prefers the
+indexes on a realistically sized table, so run the EXPLAIN check against the
+loaded data, not an empty schema.
+
+Run from the repository root (needs a MySQL server):
+    python benchmarks/uniform_checks_query_bench.py --rows 10000000
+    python benchmarks/uniform_checks_query_bench.py --host db.internal --password secret --rows 1000000
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The teacher app creates its template and static directories relative to the working directory
+os.chdir(os.path.join(ROOT, "teacher_login"))
+
+import pymysql
+
+from db_pool import ConnectionPool
+
+INSERT_BATCH = 10000
+
+
+class QueryRecorder:
+    """Stands in for the async pool and keeps every statement a helper sends"""
+
+    def __init__(self):
+        self.queries = []
+
+    async def fetchall(self, query, args=None):
+        self.queries.append((query, args))
+        return []
+
+    async def fetchone(self, query, args=None):
+        self.queries.append((query, args))
+        return (0,) * 10
+
+    async def execute(self, query, args=None):
+        self.queries.append((query, args))
+        return 0
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def populate(connection, args):
+    """Create students and args.rows checks spread over the last args.days days"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            id INT PRIMARY KEY,
+            student_name VARCHAR(100),
+            username VARCHAR(100),
+            password VARCHAR(100)
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM students")
+    if cursor.fetchone()[0] < args.students:
+        cursor.executemany(
+            "INSERT IGNORE INTO students (id, student_name, username, password) VALUES (%s, %s, %s, %s)",
+            [(i, f"Student {i}", f"student{i}", "bench") for i in range(1, args.students + 1)]
+        )
+    connection.commit()
+
+    app = load("uniform_app", "app.py")
+    app.db_pool = ConnectionPool(app_config(args))
+    app.create_uniform_table()
+
+    cursor.execute("SELECT COUNT(*) FROM uniform_checks")
+    existing = cursor.fetchone()[0]
+    if existing >= args.rows:
+        print(f"uniform_checks already has {existing} rows")
+        return
+
+    print(f"loading {args.rows - existing} rows...")
+    start = time.perf_counter()
+    now = datetime.now()
+    span = args.days * 86400
+    remaining = args.rows - existing
+    while remaining > 0:
+        rows = []
+        for _ in range(min(INSERT_BATCH, remaining)):
+            items = [random.random() < 0.9 for _ in range(4)]
+            rows.append((
+                random.randint(1, args.students), "bench",
+                now - timedelta(seconds=random.randint(0, span)),
+                *items, all(items), "static/uploads/bench.jpg", "llm", "ok"
+            ))
+        cursor.executemany(app.UNIFORM_CHECK_INSERT, rows)
+        connection.commit()
+        remaining -= len(rows)
+    cursor.execute("ANALYZE TABLE uniform_checks")
+    cursor.fetchall()
+    print(f"loaded in {time.perf_counter() - start:.0f}s")
+
+
+def app_config(args):
+    return {"host": args.host, "user": args.user, "password": args.password, "database": args.database}
+
+
+async def capture_queries(student_id):
+    """Run the report helpers and attendance endpoints against a recorder and return their SQL"""
+    teacher = load("teacher_app", "teacher_login/app.py")
+    attendance = load("attendance_app", "Student_attdentce/app.py")
+    recorder = QueryRecorder()
+    teacher.db = attendance.db = recorder
+
+    await teacher.get_uniform_checks_today()
+    await teacher.get_statistics()
+    await teacher.get_student_history(student_id)
+    await teacher.get_weekly_report()
+    await teacher.get_absent_students()
+    await teacher.get_non_compliant_students()
+    await attendance.get_today_attendance(student_id)
+    await attendance.get_monthly_attendance(student_id)
+    await attendance.get_attendance_summary(student_id)
+    return [(query, args) for query, args in recorder.queries if "uniform_checks" in query]
+
+
+def explain_check(cursor, queries):
+    """EXPLAIN each query; returns how many full-scan uniform_checks"""
+    failures = 0
+    for query, args in queries:
+        cursor.execute("EXPLAIN " + query, args)
+        columns = [column[0] for column in cursor.description]
+        for row in cursor.fetchall():
+            plan = dict(zip(columns, row))
+            if plan["table"] not in ("uniform_checks", "uc"):
+                continue
+            # A per-student summary reads all of that student's rows by design; only a table scan is a regression
+            scan = plan["type"] == "ALL"
+            failures += scan
+            summary = " ".join(query.split())[:90]
+            print(f"  {'FAIL' if scan else 'ok  '} type={plan['type']:<6} key={plan['key']} rows={plan['rows']}  {summary}")
+    return failures
+
+
+def time_query(cursor, query, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query, args)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def compare(cursor, student_id, repeat):
+    today = date.today()
+    start, end = datetime.combine(today, datetime.min.time()), datetime.combine(today + timedelta(days=1), datetime.min.time())
+    month_start = datetime(today.year, today.month, 1)
+    next_month = datetime(today.year + 1, 1, 1) if today.month == 12 else datetime(today.year, today.month + 1, 1)
+    cases = [
+        ("today's checks",
+         "SELECT student_id, check_time, overall_compliance FROM uniform_checks WHERE DATE(check_time) = %s",
+         (today,),
+         "SELECT student_id, check_time, overall_compliance FROM uniform_checks WHERE check_time >= %s AND check_time < %s",
+         (start, end)),
+        ("today's statistics",
+         "SELECT COUNT(*), SUM(overall_compliance = 1), SUM(overall_compliance = 0) FROM uniform_checks "
+         "WHERE DATE(check_time) = %s",
+         (today,),
+         "SELECT COUNT(*), SUM(overall_compliance = 1), SUM(overall_compliance = 0) FROM uniform_checks "
+         "WHERE check_time >= %s AND check_time < %s",
+         (start, end)),
+        ("student month",
+         "SELECT * FROM uniform_checks WHERE student_id = %s AND YEAR(check_time) = %s AND MONTH(check_time) = %s",
+         (student_id, today.year, today.month),
+         "SELECT * FROM uniform_checks WHERE student_id = %s AND check_time >= %s AND check_time < %s",
+         (student_id, month_start, next_month)),
+    ]
+    for name, old_query, old_args, new_query, new_args in cases:
+        old_ms = time_query(cursor, old_query, old_args, repeat)
+        new_ms = time_query(cursor, new_query, new_args, repeat)
+        print(f"  {name:<20} function-wrapped={old_ms:9.2f}ms  range={new_ms:8.2f}ms  ({old_ms / max(new_ms, 0.001):.0f}x)")
+
+
+def run(args):
+    server = pymysql.connect(host=args.host, user=args.user, password=args.password)
+    server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+    server.close()
+
+    connection = pymysql.connect(**app_config(args))
+    populate(connection, args)
+    cursor = connection.cursor()
+
+    print("EXPLAIN check:")
+    queries = asyncio.run(capture_queries(args.student_id))
+    failures = explain_check(cursor, queries)
+
+    print(f"timings (median of {args.repeat}):")
+    compare(cursor, args.student_id, args.repeat)
+    connection.close()
+
+    if failures:
+        sys.exit(f"{failures} uniform_checks queries full-scan the table")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--student-id", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="1234")
+    parser.add_argument("--database", default="attendance_bench")
+    run(parser.parse_args())
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from admission import DrainRate
+
+# Uniform checks processed at once in job mode
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+
+# Jobs allowed to wait for a worker before submissions are refused
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "200"))
+
+# How long finished jobs stay available for polling
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another check; retry_after is in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CheckJobQueue:
+    """Bounded queue of uniform checks processed by a fixed pool of worker tasks"""
+
+    def __init__(self, handler, workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE,
+                 result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._tasks = []
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self.drain = DrainRate()
+
+    def start(self):
+        """Spawn the worker tasks (call from the app's startup event)"""
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Cancel the worker tasks (call from the app's shutdown event)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["status"] not in ("done", "failed") or now - job["_updated"] < self.result_ttl:
+                break
+            self._jobs.popitem(last=False)
+
+    def _notify(self, job):
+        job["_updated"] = time.monotonic()
+        job["_changed"].set()
+        job["_changed"] = asyncio.Event()
+
+    def submit(self, owner, payload):
+        """Enqueue a check and return its job, or raise JobQueueFull"""
+        self._expire()
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "owner": owner,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "_enqueued": time.monotonic(),
+            "_updated": time.monotonic(),
+            "_changed": asyncio.Event()
+        }
+
+        try:
+            self._queue.put_nowait((job, payload))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(self.drain.retry_after(self._queue.qsize() + 1))
+
+        self._jobs[job["id"]] = job
+        self.submitted += 1
+        return job
+
+    async def _worker(self):
+        while True:
+            job, payload = await self._queue.get()
+            self._total_wait += time.monotonic() - job["_enqueued"]
+            self.running += 1
+            job["status"] = "running"
+            self._notify(job)
+
+            try:
+                job["result"] = await self.handler(payload)
+                job["status"] = "done"
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error processing job {job['id']}: {e}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+                self.drain.record()
+                self._queue.task_done()
+                self._notify(job)
+
+    def get(self, job_id):
+        """Return the job dict, or None if unknown or expired"""
+        return self._jobs.get(job_id)
+
+    def watch(self, job):
+        """Event that is set on the job's next state change"""
+        return job["_changed"]
+
+    async def wait_for_change(self, changed, timeout):
+        """Wait on an event from watch(); returns False on timeout"""
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def position(self, job):
+        """Approximate number of jobs ahead of a queued job"""
+        if job["status"] != "queued":
+            return 0
+        ahead = 0
+        for other in self._jobs.values():
+            if other is job:
+                break
+            if other["status"] == "queued":
+                ahead += 1
+        return ahead
+
+    def public(self, job):
+        """Client-facing view of a job"""
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "queue_position": self.position(job),
+            "result": job["result"],
+            "error": job["error"]
+        }
+
+    def stats(self):
+        started = self.completed + self.failed + self.running
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self._total_wait / started * 1000, 1) if started else 0.0,
+            "drain_rate_per_s": round(self.drain.per_second(), 2)
+        }
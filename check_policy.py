@@ -0,0 +1,106 @@
+import copy
+import math
+import os
+import time
+from datetime import date, datetime
+
+# Cooldown, daily limit and same-day reuse are opt-in (1 enables them)
+CHECK_POLICY_ENABLED = os.getenv("CHECK_POLICY_ENABLED", "0") == "1"
+
+# Minimum seconds between completed checks by the same student (0 disables)
+CHECK_COOLDOWN_SECONDS = float(os.getenv("CHECK_COOLDOWN_SECONDS", "60"))
+
+# Answer repeat checks with the day's compliant result instead of checking again
+REUSE_COMPLIANT_TODAY = os.getenv("REUSE_COMPLIANT_TODAY", "1") == "1"
+
+# Completed checks allowed per student per day (0 means unlimited)
+MAX_CHECKS_PER_DAY = int(os.getenv("MAX_CHECKS_PER_DAY", "10"))
+
+
+class CheckPolicy:
+    """Per-student cooldown, daily limit and same-day reuse, decided in memory before any model call"""
+
+    def __init__(self, enabled=CHECK_POLICY_ENABLED, cooldown=CHECK_COOLDOWN_SECONDS,
+                 reuse_compliant=REUSE_COMPLIANT_TODAY, max_per_day=MAX_CHECKS_PER_DAY):
+        self.enabled = enabled
+        self.cooldown = cooldown
+        self.reuse_compliant = reuse_compliant
+        self.max_per_day = max_per_day
+        self._day = date.today()
+        self._students = {}  # student_id -> {"count", "last_check", "in_flight", "compliant"}
+        self.allowed = 0
+        self.reused = 0
+        self.blocked = {}
+
+    def _entry(self, student_id):
+        today = date.today()
+        if today != self._day:
+            # New day: every student starts fresh
+            self._day = today
+            self._students = {}
+        return self._students.setdefault(student_id, {
+            "count": 0, "last_check": None, "in_flight": False, "compliant": None
+        })
+
+    def _block(self, reason, message, retry_after=None):
+        self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        response = {"success": False, "error": "Check not allowed", "reason": reason, "message": message}
+        if retry_after is not None:
+            response["retry_after"] = retry_after
+        return response
+
+    def begin(self, student_id):
+        """None if the check may run (call finish() afterwards), otherwise the response to send instead"""
+        if not self.enabled:
+            return None
+        entry = self._entry(student_id)
+
+        if self.reuse_compliant and entry["compliant"] is not None:
+            self.reused += 1
+            response = copy.deepcopy(entry["compliant"])
+            response["reused"] = True
+            return response
+
+        if entry["in_flight"]:
+            return self._block("in_progress", "Your previous check is still running. Please wait for its result.")
+
+        if self.max_per_day and entry["count"] >= self.max_per_day:
+            return self._block("daily_limit", f"You have used all {self.max_per_day} checks for today.")
+
+        if self.cooldown and entry["last_check"] is not None:
+            remaining = self.cooldown - (time.monotonic() - entry["last_check"])
+            if remaining > 0:
+                wait = math.ceil(remaining)
+                return self._block("cooldown", f"Please wait {wait}s before checking again.", wait)
+
+        entry["in_flight"] = True
+        self.allowed += 1
+        return None
+
+    def finish(self, student_id, response):
+        """Record a check started with begin(); only completed checks count toward the limits"""
+        if not self.enabled:
+            return
+        entry = self._entry(student_id)
+        entry["in_flight"] = False
+        if not response or not response.get("success"):
+            # Unusable photo, failed verification or model outage: let the student try again
+            return
+
+        entry["count"] += 1
+        entry["last_check"] = time.monotonic()
+        if response.get("results", {}).get("overall_compliance"):
+            entry["compliant"] = dict(copy.deepcopy(response), checked_at=datetime.now().strftime("%I:%M %p"))
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "cooldown_seconds": self.cooldown,
+            "reuse_compliant_today": self.reuse_compliant,
+            "max_checks_per_day": self.max_per_day,
+            "students_today": len(self._students),
+            "compliant_today": sum(1 for entry in self._students.values() if entry["compliant"] is not None),
+            "allowed": self.allowed,
+            "reused": self.reused,
+            "blocked": dict(self.blocked)
+        }
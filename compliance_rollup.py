@@ -0,0 +1,211 @@
+"""
+Daily compliance rollup: uniform_checks counters per (day, student) and per day.
+
+Each saved check is folded into daily_compliance_rollup in the same transaction
+as its INSERT, so the report and summary endpoints read O(days) rollup rows
+instead of re-aggregating every check. Day totals use student_id 0.
+
+Rebuild or backfill the rollup from uniform_checks (a new rollup table is
+backfilled automatically by create_uniform_table). Each --chunk-days range is
+its own transaction, so it is safe to run while the apps are serving:
+
+    python compliance_rollup.py
+    python compliance_rollup.py --since 2025-09-01 --until 2025-09-30
+"""
+import argparse
+from datetime import date, datetime, timedelta
+
+import pymysql
+
+# student_id of the per-day total rows
+ALL_STUDENTS = 0
+
+# Attempts at a check's INSERT + rollup transaction when InnoDB picks it as a deadlock victim
+ROLLUP_DEADLOCK_ATTEMPTS = 3
+
+ROLLUP_TABLE = """
+    CREATE TABLE IF NOT EXISTS daily_compliance_rollup (
+        check_date DATE NOT NULL,
+        student_id INT NOT NULL,
+        total_checks INT NOT NULL DEFAULT 0,
+        compliant INT NOT NULL DEFAULT 0,
+        non_compliant INT NOT NULL DEFAULT 0,
+        pending INT NOT NULL DEFAULT 0,
+        blazer_count INT NOT NULL DEFAULT 0,
+        tie_count INT NOT NULL DEFAULT 0,
+        shirt_count INT NOT NULL DEFAULT 0,
+        id_card_count INT NOT NULL DEFAULT 0,
+        students_present INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (check_date, student_id),
+        KEY idx_student_date (student_id, check_date)
+    )
+"""
+
+COUNTERS = [
+    "total_checks", "compliant", "non_compliant", "pending",
+    "blazer_count", "tie_count", "shirt_count", "id_card_count", "students_present"
+]
+
+# A student row's students_present stays 1; a day row's counts the student rows created for it
+ROLLUP_UPSERT = f"""
+    INSERT INTO daily_compliance_rollup (check_date, student_id, {", ".join(COUNTERS)})
+    VALUES (%s, %s, {", ".join(["%s"] * len(COUNTERS))})
+    ON DUPLICATE KEY UPDATE
+        {", ".join(f"{c} = {c} + VALUES({c})" for c in COUNTERS[:-1])},
+        students_present = IF(student_id = {ALL_STUDENTS}, students_present + VALUES(students_present), 1)
+"""
+
+REBUILD_STUDENT_ROWS = f"""
+    INSERT INTO daily_compliance_rollup (check_date, student_id, {", ".join(COUNTERS)})
+    SELECT
+        DATE(check_time),
+        student_id,
+        COUNT(*),
+        COALESCE(SUM(overall_compliance = 1), 0),
+        COALESCE(SUM(overall_compliance = 0), 0),
+        SUM(overall_compliance IS NULL),
+        COALESCE(SUM(black_blazer_or_suit), 0),
+        COALESCE(SUM(tie), 0),
+        COALESCE(SUM(white_shirt), 0),
+        COALESCE(SUM(id_card), 0),
+        1
+    FROM uniform_checks
+    WHERE check_time >= %s AND check_time < %s
+    GROUP BY DATE(check_time), student_id
+"""
+
+REBUILD_DAY_ROWS = f"""
+    INSERT INTO daily_compliance_rollup (check_date, student_id, {", ".join(COUNTERS)})
+    SELECT check_date, {ALL_STUDENTS}, {", ".join(f"SUM({c})" for c in COUNTERS)}
+    FROM daily_compliance_rollup
+    WHERE check_date >= %s AND check_date < %s AND student_id <> {ALL_STUDENTS}
+    GROUP BY check_date
+"""
+
+
+def rollup_deltas(rows):
+    """Counter deltas per (day, student) for rows in UNIFORM_CHECK_INSERT order"""
+    deltas = {}
+    for row in rows:
+        student_id, check_time = row[0], row[2]
+        blazer, tie, shirt, id_card, overall = row[3:8]
+        counts = deltas.setdefault((check_time.date(), student_id), [0] * (len(COUNTERS) - 1))
+        # A pending check has NULL items and counts only towards total and pending
+        for i, value in enumerate([
+            1, overall is not None and bool(overall), overall is not None and not overall, overall is None,
+            bool(blazer), bool(tie), bool(shirt), bool(id_card)
+        ]):
+            counts[i] += int(value)
+    return deltas
+
+
+async def add_to_rollup(cursor, rows):
+    """Fold newly inserted uniform check rows into the rollup, on the INSERT's transaction"""
+    days = {}
+    # Fixed lock order (student rows, then day rows, each sorted) keeps concurrent saves from deadlocking
+    for (check_date, student_id), counts in sorted(rollup_deltas(rows).items()):
+        await cursor.execute(ROLLUP_UPSERT, (check_date, student_id, *counts, 1))
+        day = days.setdefault(check_date, [0] * len(COUNTERS))
+        for i, count in enumerate(counts):
+            day[i] += count
+        # Affected rows is 1 for an insert and 2 for an update: a new row is a student's first check that day
+        day[-1] += 1 if cursor.rowcount == 1 else 0
+
+    for check_date, counts in sorted(days.items()):
+        await cursor.execute(ROLLUP_UPSERT, (check_date, ALL_STUDENTS, *counts))
+
+
+async def insert_checks(db, insert_query: str, rows):
+    """INSERT uniform check rows and update the rollup in one transaction on the async pool"""
+    for attempt in range(ROLLUP_DEADLOCK_ATTEMPTS):
+        try:
+            async with db.transaction() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(insert_query, rows)
+                    await add_to_rollup(cursor, rows)
+            return
+        except pymysql.err.OperationalError as e:
+            # InnoDB rolled the whole transaction back, so rerunning it can't double count
+            if e.args[0] != 1213 or attempt + 1 == ROLLUP_DEADLOCK_ATTEMPTS:
+                raise
+            print(f"Deadlock saving {len(rows)} checks, retrying")
+
+
+def create_rollup_table(connection):
+    """Create the rollup table; a newly created one is backfilled from uniform_checks"""
+    cursor = connection.cursor()
+    cursor.execute("SHOW TABLES LIKE 'daily_compliance_rollup'")
+    exists = cursor.fetchone()
+    cursor.execute(ROLLUP_TABLE)
+    connection.commit()
+    if not exists:
+        days = rebuild_rollup(connection)
+        print(f"Backfilled daily_compliance_rollup for {days} days")
+
+
+def rebuild_rollup(connection, since: date = None, until: date = None, chunk_days: int = 31):
+    """Recompute the rollup for since..until (inclusive; default all checks) from uniform_checks"""
+    cursor = connection.cursor()
+    full = since is None and until is None
+    if since is None or until is None:
+        cursor.execute("SELECT MIN(check_time), MAX(check_time) FROM uniform_checks")
+        first, last = cursor.fetchone()
+        if first is None:
+            if full:
+                cursor.execute("DELETE FROM daily_compliance_rollup")
+                connection.commit()
+            return 0
+        since = since or first.date()
+        until = until or last.date()
+
+    if full:
+        # Rows for days that no longer have any checks
+        cursor.execute(
+            "DELETE FROM daily_compliance_rollup WHERE check_date < %s OR check_date > %s", (since, until)
+        )
+        connection.commit()
+
+    days = 0
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=chunk_days), until + timedelta(days=1))
+        try:
+            cursor.execute(
+                "DELETE FROM daily_compliance_rollup WHERE check_date >= %s AND check_date < %s", (start, end)
+            )
+            cursor.execute(REBUILD_STUDENT_ROWS, (
+                datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+            ))
+            cursor.execute(REBUILD_DAY_ROWS, (start, end))
+            days += cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        start = end
+    return days
+
+
+if __name__ == "__main__":
+    from db_pool import ConnectionPool
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to rebuild (default: first check)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last day to rebuild (default: last check)")
+    parser.add_argument("--chunk-days", type=int, default=31, help="days rebuilt per transaction")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="1234")
+    parser.add_argument("--database", default="attendance")
+    args = parser.parse_args()
+
+    pool = ConnectionPool({"host": args.host, "user": args.user, "password": args.password,
+                           "database": args.database}, min_size=1, max_size=1)
+    connection = pool.connection()
+    try:
+        connection.cursor().execute(ROLLUP_TABLE)
+        days = rebuild_rollup(connection, args.since, args.until, args.chunk_days)
+        print(f"Rebuilt daily_compliance_rollup for {days} days")
+    finally:
+        connection.close()
+        pool.close()
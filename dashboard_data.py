@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+
+class DashboardStats(BaseModel):
+    total_students: int = 0
+    present_today: int = 0
+    absent_today: int = 0
+    total_checks: int = 0
+    compliant: int = 0
+    non_compliant: int = 0
+    pending: int = 0
+
+
+# Columns that are nullable in the schema are Optional here, so an incomplete row still renders
+class StudentEntry(BaseModel):
+    id: int
+    name: Optional[str] = None
+    username: Optional[str] = None
+
+
+class CheckEntry(BaseModel):
+    student_id: Optional[int] = None
+    student_name: Optional[str] = None
+    check_time: str
+    black_blazer_or_suit: Optional[bool] = None
+    tie: Optional[bool] = None
+    white_shirt: Optional[bool] = None
+    id_card: Optional[bool] = None
+    overall_compliance: Optional[bool] = None
+    image_path: Optional[str] = None
+
+
+class DayReport(BaseModel):
+    date: str
+    total: int
+    compliant: int
+    non_compliant: int
+
+
+class Violation(BaseModel):
+    student_name: Optional[str] = None
+    check_time: str
+    missing_items: str
+    image_path: Optional[str] = None
+
+
+class DashboardSnapshot(BaseModel):
+    """Everything one teacher page shows, with how long each part took to load"""
+    page: str
+    stats: DashboardStats = DashboardStats()
+    checks: List[CheckEntry] = []
+    students: List[StudentEntry] = []
+    absent_students: List[StudentEntry] = []
+    weekly_data: List[DayReport] = []
+    violations: List[Violation] = []
+    timings_ms: Dict[str, float] = {}
+    total_ms: float = 0.0
+
+    def server_timing(self, render_ms: float = None):
+        """Server-Timing header value: each part, the whole data fetch and (if given) template rendering"""
+        parts = [f"{name};dur={ms}" for name, ms in self.timings_ms.items()]
+        parts.append(f"data;dur={self.total_ms}")
+        if render_ms is not None:
+            parts.append(f"render;dur={round(render_ms, 2)}")
+        return ", ".join(parts)
+
+
+class DashboardData:
+    """Loads the parts a page needs concurrently (each on its own pooled connection) into one snapshot"""
+
+    def __init__(self, loaders: dict, pages: dict):
+        # loaders: snapshot field -> async function; pages: page name -> fields it shows
+        self.loaders = loaders
+        self.pages = pages
+        self._views = {}
+        self._totals = {}
+        self._max = {}
+
+    async def snapshot(self, page: str):
+        start = time.monotonic()
+
+        async def timed(name):
+            part_start = time.monotonic()
+            value = await self.loaders[name]()
+            return value, (time.monotonic() - part_start) * 1000
+
+        parts = self.pages[page]
+        results = await asyncio.gather(*(timed(name) for name in parts))
+        total_ms = (time.monotonic() - start) * 1000
+
+        timings = {name: ms for name, (_, ms) in zip(parts, results)}
+        self._record(page, {**timings, "data": total_ms})
+
+        # Validated part by part, so a malformed row costs its own section instead of the whole page
+        fields = {}
+        for name, (value, _) in zip(parts, results):
+            try:
+                fields[name] = getattr(DashboardSnapshot.model_validate({"page": page, name: value}), name)
+            except ValidationError as e:
+                print(f"Error loading {name} for the {page} page: {e}")
+        return DashboardSnapshot(
+            page=page,
+            timings_ms={name: round(ms, 2) for name, ms in timings.items()},
+            total_ms=round(total_ms, 2),
+            **fields
+        )
+
+    def record_render(self, page: str, render_ms: float):
+        """Add a page's template rendering time to its breakdown"""
+        self._record(page, {"render": render_ms}, count=False)
+
+    def _record(self, page, timings, count=True):
+        if count:
+            self._views[page] = self._views.get(page, 0) + 1
+        totals = self._totals.setdefault(page, {})
+        maxima = self._max.setdefault(page, {})
+        for name, ms in timings.items():
+            totals[name] = totals.get(name, 0.0) + ms
+            maxima[name] = max(maxima.get(name, 0.0), ms)
+
+    def stats(self):
+        return {
+            page: {
+                "views": views,
+                "avg_ms": {name: round(total / views, 2) for name, total in self._totals[page].items()},
+                "max_ms": {name: round(ms, 2) for name, ms in self._max[page].items()}
+            }
+            for page, views in self._views.items()
+        }
@@ -1,15 +1,22 @@
 import pymysql
 import pymysql
 
+from db_pool import get_pool
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "1234",
+    "database": "attendance"
+}
+
+# Shared connection pool for DB_CONFIG; close() returns connections to it
+db_pool = get_pool(DB_CONFIG)
+
 def create_students_table():
     try:
         # --- Connect to MySQL ---
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",
-            password="1234",
-            database="attendance"
-        )
+        connection = db_pool.connection()
 
         cursor = connection.cursor()
 
@@ -41,12 +48,7 @@ def create_students_table():
 def insert_student(id, student_name, username, password):
     try:
         # --- Connect to MySQL ---
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",
-            password="1234",
-            database="attendance"
-        )
+        connection = db_pool.connection()
 
         cursor = connection.cursor()
 
@@ -73,12 +75,7 @@ def insert_student(id, student_name, username, password):
 def view_students():
     try:
         # Connect to MySQL
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",
-            password="1234",
-            database="attendance"
-        )
+        connection = db_pool.connection()
 
         cursor = connection.cursor()
 
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+# Connections kept open once the pool is filled, and the most it will ever open
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+# Connections older than this (seconds) are closed instead of reused, ahead of the server's wait_timeout
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+
+# Idle connections are pinged on checkout once they have sat unused this long (0 pings every checkout)
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "5"))
+
+# Seconds to wait for a free connection when all of them are in use
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# Set DB_POOL_ENABLED=0 to open a fresh connection per call, as before
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "1") == "1"
+
+
+class PoolTimeout(pymysql.err.OperationalError):
+    """Raised when no connection frees up within the pool timeout"""
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, pool, raw, created):
+        self._pool = pool
+        self._raw = raw
+        self._created = created
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # A caller that never closed its connection shouldn't leak the pool slot
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of pymysql connections with lifetime, ping-on-checkout and wait metrics"""
+
+    def __init__(self, config: dict, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, ping_after=DB_POOL_PING_AFTER, timeout=DB_POOL_TIMEOUT):
+        self.config = dict(config)
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._idle = deque()  # (raw, created, last_used); most recently used on the right
+        self._open = 0  # idle + checked out
+        self._cond = threading.Condition()
+        self._closed = False
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = {}
+        self.waits = 0
+        self.exhausted = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _discard(self, raw, reason):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self.discarded[reason] = self.discarded.get(reason, 0) + 1
+            self._cond.notify()
+
+    def _checkout_slot(self, deadline):
+        """An idle (raw, created, last_used) entry, or None when the caller may open a new connection"""
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.max_size:
+                    self._open += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.exhausted += 1
+                    raise PoolTimeout(2013, f"No database connection free within {self.timeout}s "
+                                            f"({self.max_size} in use)")
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self._cond.wait(remaining)
+
+    def connection(self):
+        """Check out a healthy connection; close() on it returns it to the pool"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            entry = self._checkout_slot(deadline)
+            now = time.monotonic()
+            if entry is None:
+                try:
+                    raw = pymysql.connect(**self.config)
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                created = now
+                with self._cond:
+                    self.created += 1
+                break
+
+            raw, created, last_used = entry
+            if self.max_lifetime and now - created > self.max_lifetime:
+                self._discard(raw, "lifetime")
+                continue
+            if now - last_used >= self.ping_after:
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    self._discard(raw, "ping_failed")
+                    continue
+            break
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self.checkouts += 1
+            self._total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        return PooledConnection(self, raw, created)
+
+    def _release(self, raw, created):
+        try:
+            # End any open transaction so the next borrower doesn't read a stale snapshot
+            if raw.server_status is None or raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                raw.rollback()
+        except Exception:
+            self._discard(raw, "broken")
+            return
+
+        now = time.monotonic()
+        if self._closed:
+            self._discard(raw, "pool_closed")
+            return
+        if self.max_lifetime and now - created > self.max_lifetime:
+            self._discard(raw, "lifetime")
+            return
+        with self._cond:
+            self._idle.append((raw, created, now))
+            self._cond.notify()
+
+    def fill(self):
+        """Open connections up to min_size; called from app startup so the first requests find them ready"""
+        while True:
+            with self._cond:
+                if self._open >= self.min_size:
+                    return
+                self._open += 1
+            try:
+                raw = pymysql.connect(**self.config)
+            except Exception as e:
+                with self._cond:
+                    self._open -= 1
+                print(f"Error filling connection pool: {e}")
+                return
+            with self._cond:
+                self.created += 1
+                self._idle.appendleft((raw, time.monotonic(), time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed as they are returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for raw, _, _ in idle:
+            self._discard(raw, "pool_closed")
+
+    def stats(self):
+        with self._cond:
+            return {
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "discarded": dict(self.discarded),
+                "waits": self.waits,
+                "exhausted": self.exhausted,
+                "avg_wait_ms": round(self._total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+
+class DirectConnections:
+    """Same interface as ConnectionPool but a fresh connection per call (DB_POOL_ENABLED=0)"""
+
+    def __init__(self, config: dict):
+        self.config = dict(config)
+        self.checkouts = 0
+
+    def connection(self):
+        self.checkouts += 1
+        return pymysql.connect(**self.config)
+
+    def fill(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"pooled": False, "checkouts": self.checkouts}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config: dict):
+    """The process-wide pool for this DB config, so modules sharing a database share connections"""
+    key = tuple(sorted(config.items(), key=lambda item: item[0]))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config) if DB_POOL_ENABLED else DirectConnections(config)
+        return _pools[key]
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# "local" compares face embeddings on CPU, "llm" sends both images to the model
+FACE_VERIFIER = os.getenv("FACE_VERIFIER", "llm")
+
+# YuNet detector + SFace recognizer from the OpenCV model zoo (download steps in README.md).
+# Without both files there is no local embedder and every face check goes to the LLM.
+FACE_DETECTOR_MODEL = os.getenv("FACE_DETECTOR_MODEL", "models/face_detection_yunet_2023mar.onnx")
+FACE_RECOGNIZER_MODEL = os.getenv("FACE_RECOGNIZER_MODEL", "models/face_recognition_sface_2021dec.onnx")
+
+# Cosine distance at or below which two faces count as the same person.
+# SFace's published threshold is 0.363 similarity.
+DEFAULT_THRESHOLDS = {"sface": 0.637}
+FACE_MATCH_THRESHOLD = os.getenv("FACE_MATCH_THRESHOLD")
+
+# Precomputed reference embeddings, one .npz per user. Biometric data: keep this outside
+# static/, which the apps serve publicly
+EMBEDDING_DIR = os.getenv("FACE_EMBEDDING_DIR", "data/embeddings")
+
+# Where earlier versions stored them (under the public /static mount)
+LEGACY_EMBEDDING_DIR = "static/reference_images/embeddings"
+
+# Frames are shrunk to this before embedding
+DETECT_WIDTH = 640
+
+
+def _load_rgb(image_path, max_edge):
+    with Image.open(image_path) as img:
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_edge, max_edge))
+        return np.asarray(img)
+
+
+class SFaceEmbedder:
+    """128-d SFace embeddings of the largest YuNet-detected face"""
+
+    name = "sface"
+
+    def __init__(self, detector_model, recognizer_model):
+        self._detector = cv2.FaceDetectorYN.create(detector_model, "", (320, 320), 0.8)
+        self._recognizer = cv2.FaceRecognizerSF.create(recognizer_model, "")
+        # Verification, identification and enrollment all embed from worker threads; the detector's
+        # input size is per-call state, so one model pair serves one image at a time
+        self._lock = threading.Lock()
+
+    def embed(self, image_path):
+        rgb = _load_rgb(image_path, DETECT_WIDTH)
+        bgr = np.ascontiguousarray(rgb[:, :, ::-1])
+        with self._lock:
+            self._detector.setInputSize((bgr.shape[1], bgr.shape[0]))
+            _, faces = self._detector.detect(bgr)
+            if faces is None or len(faces) == 0:
+                return None
+            face = max(faces, key=lambda f: f[2] * f[3])
+            aligned = self._recognizer.alignCrop(bgr, face)
+            return self._recognizer.feature(aligned).flatten()
+
+
+def create_embedder(detector_model=FACE_DETECTOR_MODEL, recognizer_model=FACE_RECOGNIZER_MODEL):
+    """SFace embedder when OpenCV and both model files are available, otherwise None (the LLM decides)"""
+    if cv2 is None or not hasattr(cv2, "FaceRecognizerSF"):
+        return None
+    if os.path.exists(detector_model) and os.path.exists(recognizer_model):
+        return SFaceEmbedder(detector_model, recognizer_model)
+    return None
+
+
+class FaceVerifier:
+    """Verifies uploads against precomputed reference embeddings from a ReferenceStore"""
+
+    def __init__(self, reference_store, embedder=None, threshold=FACE_MATCH_THRESHOLD, directory=EMBEDDING_DIR):
+        self.reference_store = reference_store
+        self.embedder = embedder if embedder is not None else create_embedder()
+        backend = self.embedder.name if self.embedder else None
+        self.threshold = float(threshold) if threshold else DEFAULT_THRESHOLDS.get(backend, 0.5)
+        self.directory = directory
+        self._references = {}  # username -> (reference mtime, normalised embedding)
+        self.verified = 0
+        self.matched = 0
+        self.fallbacks = 0
+        self.computed = 0
+        self._total_ms = 0.0
+
+    def embed(self, image_path):
+        """L2-normalised embedding of the largest face, or None if no face is found"""
+        vector = self.embedder.embed(image_path)
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-6)
+
+    def _cache_path(self, username):
+        return os.path.join(self.directory, f"{username}.{self.embedder.name}.npz")
+
+    def reference_embedding(self, username):
+        """Embedding of the user's reference image, recomputed only when the image changes"""
+        if username not in self.reference_store:
+            return None
+        try:
+            mtime = os.stat(self.reference_store.path_for(username)).st_mtime
+        except FileNotFoundError:
+            self._references.pop(username, None)
+            return None
+
+        entry = self._references.get(username)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        cache_path = self._cache_path(username)
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as stored:
+                if float(stored["mtime"]) == mtime:
+                    self._references[username] = (mtime, stored["embedding"])
+                    return stored["embedding"]
+
+        embedding = self.embed(self.reference_store.path_for(username))
+        if embedding is None:
+            print(f"No face found in reference image for {username}")
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Per thread, so two checks computing the same reference don't write one temp file
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, embedding=embedding, mtime=mtime)
+        os.replace(tmp_path, cache_path)
+        self._references[username] = (mtime, embedding)
+        self.computed += 1
+        return embedding
+
+    def precompute_all(self):
+        """Compute (or load) embeddings for every reference on disk"""
+        if self.embedder is None:
+            print(f"Local face verification unavailable (needs OpenCV and {FACE_DETECTOR_MODEL}, "
+                  f"{FACE_RECOGNIZER_MODEL}; see README.md); face checks will use the LLM")
+            return
+        if os.path.isdir(LEGACY_EMBEDDING_DIR):
+            print(f"Warning: {LEGACY_EMBEDDING_DIR} is publicly served and no longer used; delete it "
+                  f"(embeddings are now kept in {self.directory})")
+        for username in list(self.reference_store.mapping):
+            self.reference_embedding(username)
+        print(f"Loaded {len(self._references)} reference embeddings ({self.embedder.name})")
+
+    def verify(self, username: str, image_path: str):
+        """Compare an upload with the user's reference; None when it can't be decided locally"""
+        if self.embedder is None:
+            return None
+
+        start = time.perf_counter()
+        try:
+            reference = self.reference_embedding(username)
+            current = self.embed(image_path) if reference is not None else None
+        except Exception as e:
+            print(f"Error computing face embedding: {e}")
+            reference = current = None
+
+        if reference is None or current is None:
+            self.fallbacks += 1
+            return None
+
+        distance = 1 - float(np.dot(reference, current))
+        same_person = distance <= self.threshold
+        margin = abs(distance - self.threshold) / self.threshold
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.verified += 1
+        self.matched += int(same_person)
+        self._total_ms += elapsed_ms
+
+        return {
+            "same_person": same_person,
+            "confidence": "high" if margin > 0.25 else "medium" if margin > 0.1 else "low",
+            "distance": round(distance, 4),
+            "threshold": self.threshold,
+            "verifier": self.embedder.name,
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+
+    def stats(self):
+        return {
+            "verifier": FACE_VERIFIER,
+            "backend": self.embedder.name if self.embedder else None,
+            "threshold": self.threshold,
+            "reference_embeddings": len(self._references),
+            "embeddings_computed": self.computed,
+            "verified": self.verified,
+            "matched": self.matched,
+            "llm_fallbacks": self.fallbacks,
+            "avg_ms": round(self._total_ms / self.verified, 2) if self.verified else 0.0
+        }
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import numpy as np
+
+# Initial row capacity; the matrix doubles when full
+INDEX_INITIAL_CAPACITY = 1024
+
+
+class FaceIndex:
+    """In-memory nearest-neighbour index over L2-normalised face embeddings"""
+
+    def __init__(self, capacity=INDEX_INITIAL_CAPACITY):
+        self._capacity = capacity
+        self._matrix = None
+        self._labels = []
+        self._rows = {}  # label -> row
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.inserts = 0
+        self.rebuilds = 0
+        self._total_search_ms = 0.0
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __contains__(self, label):
+        return label in self._rows
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-6)
+
+    def _grow(self, dim):
+        if self._matrix is None:
+            self._matrix = np.zeros((self._capacity, dim), dtype=np.float32)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding has {dim} dimensions, index holds {self._matrix.shape[1]}")
+        if len(self._labels) == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, dim), dtype=np.float32)
+            grown[:len(self._labels)] = self._matrix[:len(self._labels)]
+            self._matrix = grown
+
+    def add(self, label, vector):
+        """Insert an embedding, replacing any existing one for the label"""
+        vector = self._normalise(vector)
+        with self._lock:
+            row = self._rows.get(label)
+            if row is None:
+                self._grow(len(vector))
+                row = len(self._labels)
+                self._labels.append(label)
+                self._rows[label] = row
+            self._matrix[row] = vector
+            self.inserts += 1
+
+    def remove(self, label):
+        """Drop a label by moving the last row into its slot"""
+        with self._lock:
+            row = self._rows.pop(label, None)
+            if row is None:
+                return
+            last = len(self._labels) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._labels[row] = self._labels[last]
+                self._rows[self._labels[row]] = row
+            self._labels.pop()
+
+    def rebuild(self, items):
+        """Replace the whole index with (label, vector) pairs"""
+        labels, vectors = [], []
+        for label, vector in items:
+            labels.append(label)
+            vectors.append(self._normalise(vector))
+
+        if vectors:
+            capacity = max(self._capacity, len(vectors))
+            matrix = np.zeros((capacity, len(vectors[0])), dtype=np.float32)
+            matrix[:len(vectors)] = np.stack(vectors)
+        else:
+            matrix = None
+
+        with self._lock:
+            self._matrix = matrix
+            self._labels = labels
+            self._rows = {label: row for row, label in enumerate(labels)}
+            self.rebuilds += 1
+
+    def search(self, vector, k=1):
+        """Return up to k (label, cosine distance) pairs, nearest first"""
+        start = time.perf_counter()
+        query = self._normalise(vector)
+        with self._lock:
+            count = len(self._labels)
+            if count == 0:
+                return []
+            # Exact search: one matrix-vector product over every enrolled student
+            similarity = self._matrix[:count] @ query
+            k = min(k, count)
+            if k == 1:
+                best = [int(np.argmax(similarity))]
+            else:
+                best = np.argpartition(-similarity, k - 1)[:k]
+                best = best[np.argsort(-similarity[best])]
+            matches = [(self._labels[row], round(1 - float(similarity[row]), 4)) for row in best]
+
+        self.searches += 1
+        self._total_search_ms += (time.perf_counter() - start) * 1000
+        return matches
+
+    def stats(self):
+        return {
+            "size": len(self._labels),
+            "dimensions": self._matrix.shape[1] if self._matrix is not None else 0,
+            "capacity": self._matrix.shape[0] if self._matrix is not None else 0,
+            "searches": self.searches,
+            "inserts": self.inserts,
+            "rebuilds": self.rebuilds,
+            "avg_search_ms": round(self._total_search_ms / self.searches, 3) if self.searches else 0.0
+        }
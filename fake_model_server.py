@@ -0,0 +1,105 @@
+"""
+Local OpenAI-compatible chat-completions server for offline load tests.
+
+Answers every request with canned uniform/face JSON after a sampled delay and
+fails a configurable fraction of calls. Point the apps at it with
+MODEL_BACKEND=fake (FAKE_MODEL_URL defaults to http://127.0.0.1:8400/v1).
+
+    python fake_model_server.py --port 8400 --latency lognormal:1.0,0.4 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_backends import CANNED_RESULT, canned_answer, parse_latency
+
+
+def start_server(host="127.0.0.1", port=0, latency="fixed:0", error_rate=0.0, error_status=500,
+                 answer=CANNED_RESULT):
+    """Serve in a background thread; returns (server, base_url). server.calls/errors count requests"""
+    sample_latency = parse_latency(latency)
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive like a real model endpoint, so client benchmarks measure pooled connections
+        # rather than a reconnect per call (every response carries Content-Length)
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; without TCP_NODELAY a kept-alive connection
+        # stalls on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, {"calls": server.calls, "errors": server.errors})
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            with server.lock:
+                server.calls += 1
+            time.sleep(sample_latency())
+
+            if random.random() < error_rate:
+                with server.lock:
+                    server.errors += 1
+                self._send_json(error_status, {"error": {"message": "Injected failure", "code": error_status}})
+                return
+
+            self._send_json(200, {
+                "id": f"fake-{server.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": canned_answer(request["messages"], answer)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.calls = 0
+    server.errors = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", default="fixed:1.0", help="fixed:S, uniform:LO,HI, normal:MEAN,SD, "
+                                                               "lognormal:MEDIAN,SIGMA or exponential:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed calls (e.g. 429, 503)")
+    parser.add_argument("--answers", help="JSON file with the result object to return instead of the default")
+    args = parser.parse_args()
+
+    answer = CANNED_RESULT
+    if args.answers:
+        with open(args.answers) as f:
+            answer = json.load(f)
+
+    server, base_url = start_server(args.host, args.port, args.latency, args.error_rate, args.error_status, answer)
+    print(f"Fake model listening on {base_url} (latency {args.latency}, error rate {args.error_rate})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# How long a completed submission's result is replayed for a repeated key
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+
+
+class IdempotencyStore:
+    """Runs each (scope, key) once; repeats attach to the in-flight run or get its stored result"""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS):
+        self.ttl = ttl
+        # (scope, key) -> [future, expires]; expires is None while in flight, and completed
+        # entries are moved to the end, so they stay in expiry order
+        self._entries = OrderedDict()
+        self.executed = 0
+        self.attached = 0
+        self.replayed = 0
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = []
+        for entry_key, (future, expires) in self._entries.items():
+            if expires is None:
+                # Still running: a retry must attach to it, however long it takes
+                continue
+            if expires > now:
+                break
+            expired.append(entry_key)
+        for entry_key in expired:
+            del self._entries[entry_key]
+
+    async def run(self, scope, key: str, fn):
+        """Await fn() once per key and return (result, replayed); without a key fn() always runs"""
+        if not key:
+            return await fn(), False
+
+        self._expire()
+        entry = self._entries.get((scope, key))
+        if entry:
+            future = entry[0]
+            if future.done():
+                self.replayed += 1
+            else:
+                self.attached += 1
+            # Shield so a duplicate giving up doesn't cancel the original run
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[(scope, key)] = [future, None]
+        self.executed += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            # Nothing was recorded, so a retry with the same key may run again
+            self._entries.pop((scope, key), None)
+            if isinstance(e, asyncio.CancelledError):
+                e = RuntimeError("The original submission was cancelled")
+            future.set_exception(e)
+            # Mark it retrieved so a failure nobody else waited on isn't logged as unhandled
+            future.exception()
+            raise
+
+        # The replay window starts when the result exists, not when the submission arrived
+        self._entries[(scope, key)][1] = time.monotonic() + self.ttl
+        self._entries.move_to_end((scope, key))
+        future.set_result(result)
+        return result, False
+
+    def stats(self):
+        in_flight = sum(1 for future, _ in self._entries.values() if not future.done())
+        return {
+            "keys": len(self._entries),
+            "in_flight": in_flight,
+            "executed": self.executed,
+            "attached_in_flight": self.attached,
+            "replayed": self.replayed,
+            "ttl_seconds": self.ttl
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Longest edge (pixels) of the image sent to the model
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+
+# Re-encoding settings for the model copy: JPEG or WEBP
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+
+# Keep the full-resolution upload on disk next to the compact model copy
+KEEP_ORIGINAL_UPLOADS = os.getenv("KEEP_ORIGINAL_UPLOADS", "1") == "1"
+
+# "thread" or "process"; Pillow releases the GIL for decode/resize/encode
+IMAGE_POOL = os.getenv("IMAGE_POOL", "thread")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+
+EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp", ".png": "image/png"}
+
+if IMAGE_POOL == "process":
+    _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+else:
+    _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+
+def image_mime(path: str):
+    """MIME type for a data URL, based on the file extension"""
+    return MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/jpeg")
+
+
+def normalize_image(data: bytes, max_edge=IMAGE_MAX_EDGE, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    """Apply EXIF orientation, downscale to max_edge and re-encode"""
+    with Image.open(io.BytesIO(data)) as img:
+        # Let the JPEG decoder scale down while decoding instead of after
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        out = io.BytesIO()
+        img.save(out, format=image_format, quality=quality)
+        return out.getvalue()
+
+
+def normalize_file(original_path: str, keep_original=KEEP_ORIGINAL_UPLOADS):
+    """Write the compact model copy of an upload and return its path"""
+    stem = os.path.splitext(original_path)[0]
+    model_path = f"{stem}_model{EXTENSIONS.get(IMAGE_FORMAT, '.jpg')}"
+
+    # Uploads are content-addressed, so an existing model copy is already correct
+    if not os.path.exists(model_path):
+        try:
+            with open(original_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # An identical concurrent upload wrote the model copy before removing the shared original
+            if os.path.exists(model_path):
+                return model_path
+            raise
+
+        try:
+            compact = normalize_image(data)
+        except Exception as e:
+            # Undecodable upload: send it as-is and let the model report the problem
+            print(f"Error normalizing image: {e}")
+            return original_path
+
+        tmp_path = f"{model_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compact)
+        os.replace(tmp_path, model_path)
+
+    if not keep_original:
+        try:
+            os.remove(original_path)
+        except FileNotFoundError:
+            pass
+
+    return model_path
+
+
+async def normalize_upload(original_path: str):
+    """Normalize an upload in the worker pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, normalize_file, original_path)
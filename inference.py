@@ -0,0 +1,25 @@
+import asyncio
+import os
+
+# Maximum number of model calls in flight at once (per process)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+async def invoke_llm(llm, messages, **kwargs):
+    """Call the model without blocking the event loop, capped at LLM_MAX_CONCURRENCY"""
+    async with _llm_slots:
+        return await llm.ainvoke(messages, **kwargs)
+
+
+async def try_acquire_slot():
+    """Take a model-call slot only if one is free right now (for extra calls such as hedges)"""
+    if _llm_slots.locked():
+        return False
+    await _llm_slots.acquire()
+    return True
+
+
+def release_slot():
+    _llm_slots.release()
@@ -11,6 +11,13 @@ import pymysql
 from contextlib import contextmanager
 import requests
 import json
+import os
+import sys
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import get_pool
 
 app = FastAPI(title="Stock Market Dashboard API")
 
@@ -37,6 +44,9 @@ DB_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Shared connection pool for DB_CONFIG (DB_POOL_* settings in db_pool.py)
+db_pool = get_pool(DB_CONFIG)
+
 # Security
 SECRET_KEY = "your-secret-key-change-in-production-2024"
 ALGORITHM = "HS256"
@@ -66,7 +76,8 @@ NSE_SYMBOLS = {
 # Database Context Manager
 @contextmanager
 def get_db_connection():
-    connection = pymysql.connect(**DB_CONFIG)
+    # close() returns the connection to the pool
+    connection = db_pool.connection()
     try:
         yield connection
         connection.commit()
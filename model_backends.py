@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import random
+
+from langchain_openai import ChatOpenAI
+
+from model_client import ChatCompletionsClient, ModelCallError
+
+# "remote" is the hosted model, "fake" a local OpenAI-compatible server
+# (python fake_model_server.py), "stub" answers in-process without any HTTP
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "remote")
+
+# Very reliable free option
+MODEL_NAME = os.getenv("MODEL_NAME", "google/gemini-2.5-flash-image")
+MODEL_BASE_URL = os.getenv("MODEL_BASE_URL", "https://openrouter.ai/api/v1")
+
+# HTTP client for remote/fake: "langchain" (ChatOpenAI) or "direct" (pooled httpx client)
+MODEL_CLIENT = os.getenv("MODEL_CLIENT", "langchain")
+
+# Where the fake server listens
+FAKE_MODEL_URL = os.getenv("FAKE_MODEL_URL", "http://127.0.0.1:8400/v1")
+
+# Stub behaviour: latency distribution (see parse_latency) and fraction of failed calls
+STUB_LATENCY = os.getenv("MODEL_STUB_LATENCY", "fixed:0")
+STUB_ERROR_RATE = float(os.getenv("MODEL_STUB_ERROR_RATE", "0"))
+
+# Answer used for every check: compliant, same person
+CANNED_RESULT = {
+    "black_blazer_or_suit": {"present": True},
+    "tie": {"present": True},
+    "white_shirt": {"present": True},
+    "id_card": {"present": True},
+    "beard": {"present": False},
+    "overall_compliance": True,
+    "same_person": True,
+    "confidence": "high"
+}
+
+
+# Latency specs: fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA, exponential:MEAN
+def parse_latency(spec: str):
+    """Turn a latency spec into a sampler returning seconds"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(random.gauss(values[0], values[1]), 0.0)
+    if kind == "lognormal":
+        # Parameterised by the median so "lognormal:1.0,0.5" has a 1s p50 and a long tail
+        return lambda: values[0] * random.lognormvariate(0, values[1])
+    if kind == "exponential":
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def canned_answer(messages: list, answer: dict = CANNED_RESULT):
+    """Reply text for a chat request: one object per photo for batch prompts, one object otherwise"""
+    content = messages[0]["content"]
+    if isinstance(content, str):
+        return json.dumps(answer)
+
+    text = next((part.get("text", "") for part in content if part.get("type") == "text"), "")
+    if "JSON array" in text:
+        photos = sum(1 for part in content if part.get("type") == "image_url")
+        return json.dumps([answer] * photos)
+    return json.dumps(answer)
+
+
+class StubResponse:
+    """Just enough of a chat message for the callers (they only read .content)"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class StubModel:
+    """In-process stand-in for ChatOpenAI: sleeps, sometimes fails, returns canned JSON"""
+
+    def __init__(self, latency=STUB_LATENCY, error_rate=STUB_ERROR_RATE, answer=CANNED_RESULT):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.answer = answer
+        self.calls = 0
+        self.errors = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency())
+        if random.random() < self.error_rate:
+            self.errors += 1
+            raise ModelCallError(503, "Injected failure")
+        return StubResponse(canned_answer(messages, self.answer))
+
+
+def create_llm(api_key: str, backend: str = MODEL_BACKEND, base_url: str = None, client: str = MODEL_CLIENT):
+    """Build the model client for the configured backend (base_url overrides the backend's URL)"""
+    if client == "direct" and backend in ("remote", "fake"):
+        if backend == "remote":
+            return ChatCompletionsClient(MODEL_NAME, base_url or MODEL_BASE_URL, api_key)
+        return ChatCompletionsClient("fake", base_url or FAKE_MODEL_URL, "fake")
+
+    if backend == "remote":
+        return ChatOpenAI(
+            model=MODEL_NAME,
+            temperature=0.1,
+            max_tokens=200,
+            base_url=base_url or MODEL_BASE_URL,
+            api_key=api_key,
+            # Retries are handled by resilience.ResilientModel
+            max_retries=0
+        )
+    if backend == "fake":
+        return ChatOpenAI(
+            model="fake",
+            temperature=0.1,
+            max_tokens=200,
+            base_url=base_url or FAKE_MODEL_URL,
+            api_key="fake",
+            max_retries=0
+        )
+    if backend == "stub":
+        return StubModel()
+    raise ValueError(f"Unknown MODEL_BACKEND: {backend}")
@@ -0,0 +1,82 @@
+import json
+import os
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Negotiate HTTP/2 when the h2 package is installed (one connection multiplexes many calls)
+MODEL_HTTP2 = os.getenv("MODEL_HTTP2", "1") == "1"
+
+# Connection pool: total connections and how many idle keep-alive connections to hold
+MODEL_MAX_CONNECTIONS = int(os.getenv("MODEL_MAX_CONNECTIONS", "32"))
+MODEL_MAX_KEEPALIVE = int(os.getenv("MODEL_MAX_KEEPALIVE", "16"))
+
+# Seconds to establish a connection, and to wait for the model's answer
+MODEL_CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+MODEL_READ_TIMEOUT = float(os.getenv("MODEL_READ_TIMEOUT", "60"))
+
+
+class ModelCallError(Exception):
+    """Raised when the chat-completions endpoint answers with an error"""
+
+    def __init__(self, status_code, message, response=None):
+        super().__init__(f"Model call failed ({status_code}): {message}")
+        self.status_code = status_code
+        # Kept so retries can honour the Retry-After header
+        self.response = response
+
+
+class ChatResponse:
+    """Reply from the model (callers only read .content)"""
+
+    def __init__(self, content: str, raw: dict):
+        self.content = content
+        self.raw = raw
+
+
+class ChatCompletionsClient:
+    """Lean drop-in for ChatOpenAI.ainvoke: one pooled keep-alive client, one POST per call"""
+
+    def __init__(self, model: str, base_url: str, api_key: str, temperature=0.1, max_tokens=200,
+                 http2=MODEL_HTTP2, max_connections=MODEL_MAX_CONNECTIONS, max_keepalive=MODEL_MAX_KEEPALIVE,
+                 connect_timeout=MODEL_CONNECT_TIMEOUT, read_timeout=MODEL_READ_TIMEOUT):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            http2=self.http2
+        )
+
+    async def ainvoke(self, messages: list, **kwargs):
+        """Send OpenAI-style message dicts and return the first choice"""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            **kwargs
+        }
+        # Serialise once straight to bytes; the base64 image strings are embedded
+        # as-is (nothing in them needs escaping) and httpx sends the buffer untouched
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+        response = await self._client.post("/chat/completions", content=body)
+        if response.status_code >= 400:
+            raise ModelCallError(response.status_code, response.text[:200], response)
+
+        data = response.json()
+        return ChatResponse(data["choices"][0]["message"]["content"] or "", data)
+
+    async def aclose(self):
+        """Close pooled connections (call from the app's shutdown event)"""
+        await self._client.aclose()
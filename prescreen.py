@@ -0,0 +1,153 @@
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Reject unusable frames locally before any model call
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "1") == "1"
+
+# Variance of the Laplacian below this means the frame is out of focus
+PRESCREEN_MIN_SHARPNESS = float(os.getenv("PRESCREEN_MIN_SHARPNESS", "40"))
+
+# Mean brightness (0-255) outside this range is too dark / washed out
+PRESCREEN_MIN_BRIGHTNESS = float(os.getenv("PRESCREEN_MIN_BRIGHTNESS", "40"))
+PRESCREEN_MAX_BRIGHTNESS = float(os.getenv("PRESCREEN_MAX_BRIGHTNESS", "220"))
+
+# Brightness spread below this means a blank frame (covered lens, empty wall)
+PRESCREEN_MIN_CONTRAST = float(os.getenv("PRESCREEN_MIN_CONTRAST", "12"))
+
+# Smallest face searched for, as a fraction of frame height (needs OpenCV);
+# anyone further from the camera than this counts as no face
+PRESCREEN_MIN_FACE_FRACTION = float(os.getenv("PRESCREEN_MIN_FACE_FRACTION", "0.12"))
+
+# Frames are analysed at this width for focus/exposure
+ANALYSIS_WIDTH = 320
+
+# The Haar cascade's detection window; the face copy is made just tall enough that
+# the smallest wanted face (min_face_fraction of the height) still covers it
+FACE_WINDOW = 24
+
+MESSAGES = {
+    "unreadable": "The photo could not be read. Please retake it.",
+    "too_dark": "The photo is too dark. Please improve the lighting and retake it.",
+    "too_bright": "The photo is overexposed. Please retake it away from direct light.",
+    "empty": "Nobody is in view. Please stand in front of the camera.",
+    "blurry": "The photo is blurry. Please hold still and retake it.",
+    "no_face": "No face detected. Please face the camera and move closer."
+}
+
+
+class FramePrescreen:
+    """Fast CPU checks for blur, exposure and subject presence"""
+
+    def __init__(self, min_sharpness=PRESCREEN_MIN_SHARPNESS, min_brightness=PRESCREEN_MIN_BRIGHTNESS,
+                 max_brightness=PRESCREEN_MAX_BRIGHTNESS, min_contrast=PRESCREEN_MIN_CONTRAST,
+                 min_face_fraction=PRESCREEN_MIN_FACE_FRACTION):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.min_face_fraction = min_face_fraction
+        self._face_height = math.ceil(FACE_WINDOW / max(min_face_fraction, 0.01))
+        self._cascade_path = None
+        # Haar cascades ship with OpenCV 4.x; without them only the face checks are skipped
+        if cv2 is not None and hasattr(cv2, "CascadeClassifier"):
+            self._cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self._local = threading.local()
+        self.screened = 0
+        self.rejected = {}
+        self.calls_saved = 0
+        self._total_ms = 0.0
+
+    def _face_detector(self):
+        """This thread's cascade: detectMultiScale isn't thread-safe and screen() runs in worker threads"""
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.CascadeClassifier(self._cascade_path)
+        return detector
+
+    def _check(self, image_path):
+        with Image.open(image_path) as img:
+            img.draft("L", (ANALYSIS_WIDTH, max(ANALYSIS_WIDTH, self._face_height)))
+            gray = img.convert("L")
+        face = gray.copy()
+        # Height-bound copy, so the minimum face fraction holds for any aspect ratio
+        face.thumbnail((face.width, self._face_height))
+        face_pixels = np.asarray(face)
+        gray.thumbnail((ANALYSIS_WIDTH, ANALYSIS_WIDTH))
+        pixels = np.asarray(gray, dtype=np.float32)
+
+        metrics = {
+            "brightness": round(float(pixels.mean()), 1),
+            "contrast": round(float(pixels.std()), 1)
+        }
+        if metrics["brightness"] < self.min_brightness:
+            return "too_dark", metrics
+        if metrics["brightness"] > self.max_brightness:
+            return "too_bright", metrics
+        if metrics["contrast"] < self.min_contrast:
+            return "empty", metrics
+
+        laplacian = (
+            pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+            - 4 * pixels[1:-1, 1:-1]
+        )
+        metrics["sharpness"] = round(float(laplacian.var()), 1)
+        if metrics["sharpness"] < self.min_sharpness:
+            return "blurry", metrics
+
+        if self._cascade_path is not None:
+            # Faces smaller than the minimum subject size are never searched for; the floor
+            # only applies to frames smaller than the face copy's intended height
+            min_face = max(int(face_pixels.shape[0] * self.min_face_fraction), FACE_WINDOW)
+            faces = self._face_detector().detectMultiScale(
+                face_pixels, scaleFactor=1.2, minNeighbors=5, minSize=(min_face, min_face)
+            )
+            if len(faces) == 0:
+                return "no_face", metrics
+            metrics["face_fraction"] = round(float(max(h for _, _, _, h in faces) / face_pixels.shape[0]), 3)
+
+        return None, metrics
+
+    def screen(self, image_path: str, model_calls: int = 1):
+        """Screen a frame; model_calls is how many upstream calls a rejection saves"""
+        start = time.perf_counter()
+        try:
+            reason, metrics = self._check(image_path)
+        except Exception as e:
+            print(f"Error screening image: {e}")
+            reason, metrics = "unreadable", {}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.screened += 1
+        self._total_ms += elapsed_ms
+        if reason:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+            self.calls_saved += model_calls
+
+        return {
+            "ok": reason is None,
+            "reason": reason,
+            "message": MESSAGES.get(reason),
+            "metrics": metrics,
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+
+    def stats(self):
+        return {
+            "enabled": PRESCREEN_ENABLED,
+            "face_detection": self._cascade_path is not None,
+            "screened": self.screened,
+            "rejected": dict(self.rejected),
+            "rejected_total": sum(self.rejected.values()),
+            "model_calls_saved": self.calls_saved,
+            "avg_ms": round(self._total_ms / self.screened, 2) if self.screened else 0.0
+        }
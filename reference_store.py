@@ -0,0 +1,162 @@
+import base64
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+REFERENCE_DIR = "static/reference_images"
+
+# Enrolled references (username -> filename), merged over the hardcoded mapping
+REFERENCE_INDEX_FILE = "references.json"
+
+# Upper bound on encoded reference payloads kept in memory
+REFERENCE_MAX_BYTES = int(os.getenv("REFERENCE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# How often a cached reference is re-checked on disk for changes
+REFERENCE_RECHECK_SECONDS = float(os.getenv("REFERENCE_RECHECK_SECONDS", "5"))
+
+USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class ReferenceStore:
+    """Reference images kept in memory as ready-to-send data URLs"""
+
+    def __init__(self, mapping: dict, directory=REFERENCE_DIR, max_bytes=REFERENCE_MAX_BYTES,
+                 recheck_seconds=REFERENCE_RECHECK_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.recheck_seconds = recheck_seconds
+        self.mapping = dict(mapping)
+        self._cache = OrderedDict()  # username -> [mtime, data_url, last_checked]
+        self._cached_bytes = 0
+        # get() runs on the event loop while enroll() and preloading run in worker threads
+        self._lock = threading.Lock()
+        self._enroll_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+        index_path = os.path.join(directory, REFERENCE_INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.mapping.update(json.load(f))
+
+    def __contains__(self, username):
+        return username in self.mapping
+
+    def path_for(self, username):
+        return os.path.join(self.directory, self.mapping[username])
+
+    def _drop(self, username):
+        """Remove a cached entry; the caller holds _lock"""
+        entry = self._cache.pop(username, None)
+        if entry:
+            self._cached_bytes -= len(entry[1])
+
+    def _load(self, username, mtime):
+        """Read and encode one reference, evicting least recently used entries over the cap"""
+        with open(self.path_for(username), "rb") as f:
+            data_url = f"data:image/jpeg;base64,{base64.b64encode(f.read()).decode()}"
+
+        with self._lock:
+            self._drop(username)
+            self._cache[username] = [mtime, data_url, time.monotonic()]
+            self._cached_bytes += len(data_url)
+            self.loads += 1
+
+            while self._cached_bytes > self.max_bytes and len(self._cache) > 1:
+                oldest = next(iter(self._cache))
+                self._drop(oldest)
+                self.evictions += 1
+
+        return data_url
+
+    def load_all(self):
+        """Preload every mapped reference that exists on disk"""
+        for username in self.mapping:
+            self.get(username)
+        print(f"Loaded {len(self._cache)} reference images ({self._cached_bytes} bytes)")
+
+    def get(self, username):
+        """Return the reference as a data URL, or None if the user has no reference on disk"""
+        if username not in self.mapping:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry and now - entry[2] < self.recheck_seconds:
+                self._cache.move_to_end(username)
+                return entry[1]
+
+        try:
+            mtime = os.stat(self.path_for(username)).st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(username)
+            return None
+
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry and entry[0] == mtime:
+                entry[2] = now
+                self._cache.move_to_end(username)
+                return entry[1]
+
+        return self._load(username, mtime)
+
+    def enroll(self, username: str, image_bytes: bytes):
+        """Add or replace a user's reference image and persist the mapping"""
+        if not USERNAME_PATTERN.match(username):
+            raise ValueError("Invalid username")
+
+        # Fully decoded, so a truncated or non-image upload is rejected instead of becoming the reference
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                img.load()
+                if img.format != "JPEG":
+                    # References are stored (and sent to the model) as .jpg
+                    out = io.BytesIO()
+                    img.convert("RGB").save(out, format="JPEG", quality=95)
+                    image_bytes = out.getvalue()
+        except Exception as e:
+            raise ValueError("Not a valid image") from e
+
+        # One enrollment at a time, so concurrent ones can't share a temp file or lose an index update
+        with self._enroll_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            filename = f"{username}.jpg"
+            path = os.path.join(self.directory, filename)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, path)
+
+            self.mapping[username] = filename
+            enrolled = {}
+            index_path = os.path.join(self.directory, REFERENCE_INDEX_FILE)
+            if os.path.exists(index_path):
+                with open(index_path) as f:
+                    enrolled = json.load(f)
+            enrolled[username] = filename
+            with open(f"{index_path}.tmp", "w") as f:
+                json.dump(enrolled, f, indent=2)
+            os.replace(f"{index_path}.tmp", index_path)
+
+            return self._load(username, os.stat(path).st_mtime)
+
+    def stats(self):
+        with self._lock:
+            cached, cached_bytes = len(self._cache), self._cached_bytes
+        return {
+            "references": len(self.mapping),
+            "cached": cached,
+            "cached_bytes": cached_bytes,
+            "max_bytes": self.max_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
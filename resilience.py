@@ -0,0 +1,235 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import httpx
+
+from inference import release_slot, try_acquire_slot
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+# Retries after the first attempt on 429/5xx/timeouts, with exponential backoff and full jitter
+MODEL_RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+MODEL_BACKOFF_BASE = float(os.getenv("MODEL_BACKOFF_BASE", "0.5"))
+MODEL_BACKOFF_MAX = float(os.getenv("MODEL_BACKOFF_MAX", "8"))
+
+# Send a duplicate request when a call runs past the recent p95 latency
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", "1") == "1"
+
+# Hedge delay until enough latencies are observed, and the bounds on the measured p95
+MODEL_HEDGE_DEFAULT_SECONDS = float(os.getenv("MODEL_HEDGE_DEFAULT_SECONDS", "8"))
+MODEL_HEDGE_MIN_SECONDS = float(os.getenv("MODEL_HEDGE_MIN_SECONDS", "1"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Consecutive failed calls that open the breaker, and how long it stays open before a trial call
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """Raised without calling the model while the breaker is open"""
+
+
+def is_retryable(error: Exception):
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if openai is not None and isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return False
+
+
+def retry_after(error: Exception):
+    """Seconds the server asked us to wait (Retry-After on a 429/503), if any"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through per reset period"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.rejected += 1
+                return False
+            # One trial call decides whether to close again
+            self.state = "half_open"
+            self.trial_started = time.monotonic()
+            return True
+        if self.state == "half_open":
+            # A trial that never reported back (e.g. lost to a crash) doesn't hold the breaker forever
+            if time.monotonic() - self.trial_started >= self.reset_seconds:
+                self.trial_started = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+        return True
+
+    def release_trial(self):
+        """The trial call was abandoned without an outcome; the next call becomes the trial"""
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.reset_seconds
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class ResilientModel:
+    """Wraps a model client's ainvoke with retries, hedged requests and a circuit breaker"""
+
+    def __init__(self, llm, retries=MODEL_RETRIES, backoff_base=MODEL_BACKOFF_BASE, backoff_max=MODEL_BACKOFF_MAX,
+                 hedging=MODEL_HEDGING, breaker=None):
+        self.llm = llm
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedging = hedging
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.failed = 0
+
+    def hedge_delay(self):
+        """Recent p95 latency of successful calls, or the default until there is enough data"""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return MODEL_HEDGE_DEFAULT_SECONDS
+        ordered = sorted(self._latencies)
+        return max(ordered[int(len(ordered) * 0.95) - 1], MODEL_HEDGE_MIN_SECONDS)
+
+    async def _timed(self, messages, kwargs):
+        start = time.monotonic()
+        response = await self.llm.ainvoke(messages, **kwargs)
+        self._latencies.append(time.monotonic() - start)
+        return response
+
+    async def _hedged(self, messages, kwargs):
+        """Run the call; if it outlasts the hedge delay, race a duplicate and keep the first answer"""
+        primary = asyncio.create_task(self._timed(messages, kwargs))
+        tasks = [primary]
+        try:
+            if self.hedging:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+                # The duplicate needs its own free invoke_llm slot, so hedging never exceeds LLM_MAX_CONCURRENCY
+                if not done and await try_acquire_slot():
+                    self.hedged += 1
+                    hedge = asyncio.create_task(self._timed(messages, kwargs))
+                    hedge.add_done_callback(lambda _: release_slot())
+                    tasks.append(hedge)
+                elif not done:
+                    self.hedges_skipped += 1
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Every attempt failed: report the primary's error
+            return primary.result()
+        finally:
+            # Drop the losing duplicate (or everything, if the caller gave up)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if not self.breaker.allow():
+            raise CircuitOpen("Model temporarily unavailable (circuit open)")
+        trial = self.breaker.state == "half_open"
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await self._hedged(messages, kwargs)
+                    self.breaker.record_success()
+                    return response
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The upstream answered; a bad request says nothing about its health
+                        self.breaker.record_success()
+                        self.failed += 1
+                        raise
+                    if attempt >= self.retries or self.breaker.state == "open":
+                        self.breaker.record_failure()
+                        self.failed += 1
+                        raise
+
+                    delay = retry_after(e) or random.uniform(0, self.backoff_base * 2 ** attempt)
+                    delay = min(delay, self.backoff_max)
+                    attempt += 1
+                    self.retried += 1
+                    print(f"Model call failed ({e}), retry {attempt}/{self.retries} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        except BaseException as e:
+            # Cancelled (face check failed, client left): no verdict on the model, so free the trial
+            if trial and not isinstance(e, Exception):
+                self.breaker.release_trial()
+            raise
+
+    async def aclose(self):
+        if hasattr(self.llm, "aclose"):
+            await self.llm.aclose()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "failed": self.failed,
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "breaker": self.breaker.stats()
+        }
@@ -0,0 +1,107 @@
+import copy
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+from PIL import Image
+
+# Frames whose hashes differ by at most this many bits count as the same photo
+CACHE_MAX_DISTANCE = int(os.getenv("UNIFORM_CACHE_MAX_DISTANCE", "6"))
+CACHE_TTL_SECONDS = float(os.getenv("UNIFORM_CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("UNIFORM_CACHE_MAX_ENTRIES", "1024"))
+
+
+def perceptual_hash(image_path: str):
+    """Compute a 64-bit difference hash (dHash) of an image, or None if it can't be read"""
+    try:
+        with Image.open(image_path) as img:
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception as e:
+        print(f"Error hashing image: {e}")
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class UniformResultCache:
+    """LRU cache of uniform results keyed on (student id, perceptual hash) with a TTL"""
+
+    def __init__(self, max_distance=CACHE_MAX_DISTANCE, ttl_seconds=CACHE_TTL_SECONDS,
+                 max_entries=CACHE_MAX_ENTRIES):
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._hashes_by_student = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        del self._entries[key]
+        student_id, phash = key
+        self._hashes_by_student[student_id].discard(phash)
+        if not self._hashes_by_student[student_id]:
+            del self._hashes_by_student[student_id]
+
+    def get(self, student_id, phash):
+        """Return a copy of the closest fresh result for this student, or None"""
+        if phash is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        best_key = None
+        best_distance = self.max_distance + 1
+
+        for candidate in list(self._hashes_by_student.get(student_id, ())):
+            key = (student_id, candidate)
+            result, stored_at = self._entries[key]
+            if now - stored_at > self.ttl_seconds:
+                self._remove(key)
+                continue
+            distance = bin(phash ^ candidate).count("1")
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        return copy.deepcopy(self._entries[best_key][0])
+
+    def put(self, student_id, phash, result):
+        """Store a result, evicting the least recently used entries past max_entries"""
+        if phash is None:
+            return
+
+        key = (student_id, phash)
+        self._entries[key] = (copy.deepcopy(result), time.monotonic())
+        self._entries.move_to_end(key)
+        self._hashes_by_student[student_id].add(phash)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters for tuning the distance threshold and TTL"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries
+        }
@@ -2,11 +2,20 @@ from fastapi import FastAPI, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import pymysql
 from datetime import datetime, date, timedelta
+import asyncio
 import os
+import sys
+import time
 from collections import defaultdict
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_db import get_async_pool
+from compliance_rollup import ALL_STUDENTS
+from dashboard_data import DashboardData
+
 app = FastAPI()
 
 # Create necessary directories
@@ -24,6 +33,9 @@ DB_CONFIG = {
     "database": "attendance"
 }
 
+# Async connection pool for DB_CONFIG, so queries don't block the event loop (DB_POOL_* settings)
+db = get_async_pool(DB_CONFIG)
+
 # Teacher credentials (hardcoded - not in database)
 TEACHER_USERNAME = "teach26"
 TEACHER_PASSWORD = "teach@123"
@@ -32,37 +44,30 @@ TEACHER_PASSWORD = "teach@123"
 teacher_sessions = {}
 
 
-def get_db_connection():
-    """Create database connection"""
-    return pymysql.connect(**DB_CONFIG)
+def day_range(start_day: date, end_day: date = None):
+    """Half-open [start, end + 1 day) bounds, so check_time is compared directly and its indexes are used"""
+    end_day = end_day or start_day
+    start = datetime.combine(start_day, datetime.min.time())
+    end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+    return start, end
 
 
-def get_all_students():
+async def get_all_students():
     """Get all students from database"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         query = "SELECT id, student_name, username FROM students ORDER BY student_name"
-        cursor.execute(query)
-        students = cursor.fetchall()
+        students = await db.fetchall(query)
         
         return [{"id": s[0], "name": s[1], "username": s[2]} for s in students]
         
     except Exception as e:
         print(f"Error fetching students: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_uniform_checks_today():
+async def get_uniform_checks_today():
     """Get today's uniform checks"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         today = date.today()
         query = """
             SELECT 
@@ -76,12 +81,11 @@ def get_uniform_checks_today():
                 uc.overall_compliance,
                 uc.image_path
             FROM uniform_checks uc
-            WHERE DATE(uc.check_time) = %s
+            WHERE uc.check_time >= %s AND uc.check_time < %s
             ORDER BY uc.check_time DESC
         """
         
-        cursor.execute(query, (today,))
-        checks = cursor.fetchall()
+        checks = await db.fetchall(query, day_range(today))
         
         results = []
         for check in checks:
@@ -102,51 +106,36 @@ def get_uniform_checks_today():
     except Exception as e:
         print(f"Error fetching checks: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_statistics():
+async def get_statistics():
     """Get uniform compliance statistics"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         today = date.today()
         
-        # Today's stats
+        # Today's stats and present students (who checked in today), from the day's rollup row
         query_today = """
-            SELECT 
-                COUNT(*) as total_checks,
-                SUM(overall_compliance) as compliant,
-                COUNT(*) - SUM(overall_compliance) as non_compliant
-            FROM uniform_checks
-            WHERE DATE(check_time) = %s
+            SELECT total_checks, compliant, non_compliant, pending, students_present
+            FROM daily_compliance_rollup
+            WHERE check_date = %s AND student_id = %s
         """
-        cursor.execute(query_today, (today,))
-        today_stats = cursor.fetchone()
-        
-        # Present students (who checked in today)
-        query_present = """
-            SELECT COUNT(DISTINCT student_id) 
-            FROM uniform_checks 
-            WHERE DATE(check_time) = %s
-        """
-        cursor.execute(query_present, (today,))
-        present_count = cursor.fetchone()[0]
-        
-        # Total students
-        cursor.execute("SELECT COUNT(*) FROM students")
-        total_students = cursor.fetchone()[0]
+        # Total students, fetched alongside on a second pooled connection
+        today_stats, total_students = await asyncio.gather(
+            db.fetchone(query_today, (today, ALL_STUDENTS)),
+            db.fetchone("SELECT COUNT(*) FROM students")
+        )
+        today_stats = today_stats or (0,) * 5
+        total_students = total_students[0]
+        present_count = today_stats[4]
         
         return {
             "total_students": total_students,
             "present_today": present_count,
             "absent_today": total_students - present_count,
-            "total_checks": today_stats[0] or 0,
-            "compliant": today_stats[1] or 0,
-            "non_compliant": today_stats[2] or 0
+            "total_checks": today_stats[0],
+            "compliant": today_stats[1],
+            "non_compliant": today_stats[2],
+            "pending": today_stats[3]
         }
         
     except Exception as e:
@@ -157,19 +146,14 @@ def get_statistics():
             "absent_today": 0,
             "total_checks": 0,
             "compliant": 0,
-            "non_compliant": 0
+            "non_compliant": 0,
+            "pending": 0
         }
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_student_history(student_id: int):
+async def get_student_history(student_id: int):
     """Get uniform check history for a specific student"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         query = """
             SELECT 
                 check_time,
@@ -185,8 +169,7 @@ def get_student_history(student_id: int):
             LIMIT 10
         """
         
-        cursor.execute(query, (student_id,))
-        checks = cursor.fetchall()
+        checks = await db.fetchall(query, (student_id,))
         
         results = []
         for check in checks:
@@ -205,41 +188,30 @@ def get_student_history(student_id: int):
     except Exception as e:
         print(f"Error fetching student history: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_weekly_report():
+async def get_weekly_report():
     """Get weekly compliance report"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # Last 7 days
         end_date = date.today()
         start_date = end_date - timedelta(days=6)
         
         query = """
-            SELECT 
-                DATE(check_time) as date,
-                COUNT(*) as total_checks,
-                SUM(overall_compliance) as compliant
-            FROM uniform_checks
-            WHERE DATE(check_time) BETWEEN %s AND %s
-            GROUP BY DATE(check_time)
-            ORDER BY date
+            SELECT check_date, total_checks, compliant, non_compliant
+            FROM daily_compliance_rollup
+            WHERE student_id = %s AND check_date BETWEEN %s AND %s
+            ORDER BY check_date
         """
         
-        cursor.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        data = await db.fetchall(query, (ALL_STUDENTS, start_date, end_date))
         
         return [
             {
                 "date": row[0].strftime("%b %d"),
                 "total": row[1],
-                "compliant": row[2] or 0,
-                "non_compliant": row[1] - (row[2] or 0)
+                "compliant": row[2],
+                "non_compliant": row[3]
             }
             for row in data
         ]
@@ -247,17 +219,11 @@ def get_weekly_report():
     except Exception as e:
         print(f"Error fetching weekly report: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_absent_students():
+async def get_absent_students():
     """Get students who haven't checked in today"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         today = date.today()
         
         query = """
@@ -266,30 +232,23 @@ def get_absent_students():
             WHERE s.id NOT IN (
                 SELECT DISTINCT student_id 
                 FROM uniform_checks 
-                WHERE DATE(check_time) = %s
+                WHERE check_time >= %s AND check_time < %s
             )
             ORDER BY s.student_name
         """
         
-        cursor.execute(query, (today,))
-        students = cursor.fetchall()
+        students = await db.fetchall(query, day_range(today))
         
         return [{"id": s[0], "name": s[1], "username": s[2]} for s in students]
         
     except Exception as e:
         print(f"Error fetching absent students: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
 
 
-def get_non_compliant_students():
+async def get_non_compliant_students():
     """Get today's non-compliant students"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         today = date.today()
         
         query = """
@@ -302,12 +261,11 @@ def get_non_compliant_students():
                 id_card,
                 image_path
             FROM uniform_checks
-            WHERE DATE(check_time) = %s AND overall_compliance = 0
+            WHERE check_time >= %s AND check_time < %s AND overall_compliance = 0
             ORDER BY check_time DESC
         """
         
-        cursor.execute(query, (today,))
-        checks = cursor.fetchall()
+        checks = await db.fetchall(query, day_range(today))
         
         results = []
         for check in checks:
@@ -329,9 +287,49 @@ def get_non_compliant_students():
     except Exception as e:
         print(f"Error fetching non-compliant students: {e}")
         return []
-    finally:
-        cursor.close()
-        connection.close()
+
+
+# Loads each page's parts concurrently into one snapshot; timings go to /metrics and Server-Timing
+dashboard_data = DashboardData(
+    loaders={
+        "stats": get_statistics,
+        "checks": get_uniform_checks_today,
+        "students": get_all_students,
+        "absent_students": get_absent_students,
+        "weekly_data": get_weekly_report,
+        "violations": get_non_compliant_students
+    },
+    pages={
+        "dashboard": ["stats", "checks", "students"],
+        "reports": ["weekly_data", "stats"],
+        "attendance": ["absent_students", "checks", "stats"],
+        "violations": ["violations"],
+        "students": ["students"]
+    }
+)
+
+
+def render_page(name: str, snapshot, context: dict):
+    """Render a page template, adding its data and render times as a Server-Timing header"""
+    start = time.monotonic()
+    response = templates.TemplateResponse(name, context)
+    render_ms = (time.monotonic() - start) * 1000
+    dashboard_data.record_render(snapshot.page, render_ms)
+    response.headers["Server-Timing"] = snapshot.server_timing(render_ms)
+    return response
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the minimum number of pooled connections"""
+    await db.fill()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled database connections"""
+    await db.close()
+
 
 @app.get("/",response_class=HTMLResponse)
 @app.get("/teacher", response_class=HTMLResponse)
@@ -359,16 +357,14 @@ async def teacher_dashboard(request: Request, session: str):
     if session not in teacher_sessions:
         return RedirectResponse(url="/teacher")
     
-    stats = get_statistics()
-    checks = get_uniform_checks_today()
-    students = get_all_students()
+    data = await dashboard_data.snapshot("dashboard")
     
-    return templates.TemplateResponse("teacher_dashboard.html", {
+    return render_page("teacher_dashboard.html", data, {
         "request": request,
         "session": session,
-        "stats": stats,
-        "checks": checks,
-        "students": students,
+        "stats": data.stats,
+        "checks": data.checks,
+        "students": data.students,
         "current_date": date.today().strftime("%B %d, %Y")
     })
 
@@ -379,14 +375,13 @@ async def teacher_reports(request: Request, session: str):
     if session not in teacher_sessions:
         return RedirectResponse(url="/teacher")
     
-    weekly_data = get_weekly_report()
-    stats = get_statistics()
+    data = await dashboard_data.snapshot("reports")
     
-    return templates.TemplateResponse("teacher_reports.html", {
+    return render_page("teacher_reports.html", data, {
         "request": request,
         "session": session,
-        "weekly_data": weekly_data,
-        "stats": stats,
+        "weekly_data": data.weekly_data,
+        "stats": data.stats,
         "current_date": date.today().strftime("%B %d, %Y")
     })
 
@@ -397,16 +392,14 @@ async def teacher_attendance(request: Request, session: str):
     if session not in teacher_sessions:
         return RedirectResponse(url="/teacher")
     
-    absent = get_absent_students()
-    checks = get_uniform_checks_today()
-    stats = get_statistics()
+    data = await dashboard_data.snapshot("attendance")
     
-    return templates.TemplateResponse("teacher_attendance.html", {
+    return render_page("teacher_attendance.html", data, {
         "request": request,
         "session": session,
-        "absent_students": absent,
-        "present_checks": checks,
-        "stats": stats,
+        "absent_students": data.absent_students,
+        "present_checks": data.checks,
+        "stats": data.stats,
         "current_date": date.today().strftime("%B %d, %Y")
     })
 
@@ -417,12 +410,12 @@ async def teacher_violations(request: Request, session: str):
     if session not in teacher_sessions:
         return RedirectResponse(url="/teacher")
     
-    non_compliant = get_non_compliant_students()
+    data = await dashboard_data.snapshot("violations")
     
-    return templates.TemplateResponse("teacher_violations.html", {
+    return render_page("teacher_violations.html", data, {
         "request": request,
         "session": session,
-        "violations": non_compliant,
+        "violations": data.violations,
         "current_date": date.today().strftime("%B %d, %Y")
     })
 
@@ -433,12 +426,12 @@ async def teacher_students_list(request: Request, session: str):
     if session not in teacher_sessions:
         return RedirectResponse(url="/teacher")
     
-    students = get_all_students()
+    data = await dashboard_data.snapshot("students")
     
-    return templates.TemplateResponse("teacher_students.html", {
+    return render_page("teacher_students.html", data, {
         "request": request,
         "session": session,
-        "students": students
+        "students": data.students
     })
 
 
@@ -460,7 +453,7 @@ async def get_student_details(student_id: int, session: str):
     if session not in teacher_sessions:
         raise HTTPException(status_code=401, detail="Unauthorized")
     
-    history = get_student_history(student_id)
+    history = await get_student_history(student_id)
     return JSONResponse({"success": True, "history": history})
 
 
@@ -471,3 +464,8 @@ async def teacher_logout(session: str):
         del teacher_sessions[session]
     return RedirectResponse(url="/teacher")
 
+
+@app.get("/metrics")
+async def metrics():
+    """Expose database pool counters and per-page data/render timings"""
+    return JSONResponse({"db": db.stats(), "pages": dashboard_data.stats()})
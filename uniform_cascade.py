@@ -0,0 +1,171 @@
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Try the local classifier first and only call the model when it is unsure
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+
+# Every item must reach this confidence for the local decision to stand
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.85"))
+
+ANALYSIS_WIDTH = 320
+
+UNIFORM_ITEMS = ["black_blazer_or_suit", "tie", "white_shirt", "id_card"]
+
+
+def _score(value, threshold, spread):
+    """Map a measurement to a 0-1 likelihood around a decision threshold"""
+    return 1 / (1 + math.exp(-(value - threshold) / spread))
+
+
+class LocalUniformClassifier:
+    """Color/region heuristics for uniform items, laid out relative to the face"""
+
+    def __init__(self, min_confidence=CASCADE_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self._cascade_path = None
+        if cv2 is not None and hasattr(cv2, "CascadeClassifier"):
+            self._cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self._local = threading.local()
+        self.classified = 0
+        self.decided_locally = 0
+        self.escalated = 0
+        self._total_ms = 0.0
+
+    def _face_detector(self):
+        """This thread's cascade: detectMultiScale isn't thread-safe and classify() runs in worker threads"""
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.CascadeClassifier(self._cascade_path)
+        return detector
+
+    def _find_face(self, gray):
+        """Largest face as (x, y, w, h), assuming a centred subject without OpenCV"""
+        height, width = gray.shape
+        if self._cascade_path is not None:
+            # Search a half-size copy; faces are large in kiosk frames
+            small = np.ascontiguousarray(gray[::2, ::2])
+            min_face = max(small.shape[0] // 8, 24)
+            faces = self._face_detector().detectMultiScale(small, scaleFactor=1.2, minNeighbors=5,
+                                                           minSize=(min_face, min_face))
+            if len(faces) == 0:
+                return None, False
+            return tuple(int(v) * 2 for v in max(faces, key=lambda f: f[3])), True
+        return (int(width * 0.38), int(height * 0.08), int(width * 0.24), int(height * 0.3)), False
+
+    def _classify(self, image_path):
+        with Image.open(image_path) as img:
+            img.draft("RGB", (ANALYSIS_WIDTH, ANALYSIS_WIDTH))
+            rgb = img.convert("RGB")
+            rgb.thumbnail((ANALYSIS_WIDTH, ANALYSIS_WIDTH))
+            pixels = np.asarray(rgb, dtype=np.float32)
+            gray = np.asarray(rgb.convert("L"))
+
+        face, located = self._find_face(gray)
+        if face is None:
+            return None
+
+        height, width = gray.shape
+        fx, fy, fw, fh = face
+        top = fy + fh + fh // 10
+        if height - top < fh // 2:
+            # Torso not in frame: nothing to judge locally
+            return None
+
+        # Brightness relative to the frame so dim classrooms are judged like bright ones
+        val = pixels.max(axis=2)
+        spread = val - pixels.min(axis=2)
+        reference = max(np.percentile(val, 90), 1)
+        white = (val > 0.55 * reference) & (spread < 30)
+        dark = val < 0.35 * reference
+
+        cx = fx + fw // 2
+        tie_half = max(fw // 12, 1)
+        collar_half = max(fw // 3, tie_half + 2)
+        chest_bottom = top + (height - top) // 2
+        left, right = max(fx - fw, 0), min(fx + 2 * fw, width)
+
+        # Blazer: dark fabric either side of the shirt opening
+        sides = np.concatenate([
+            dark[top:, left:max(cx - collar_half, left + 1)].ravel(),
+            dark[top:, min(cx + collar_half, right - 1):right].ravel()
+        ])
+        blazer = _score(sides.mean(), 0.5, 0.08)
+
+        # Shirt: white on both sides of the tie below the collar
+        flank = min(
+            white[top:chest_bottom, cx - collar_half:cx - tie_half].mean(),
+            white[top:chest_bottom, cx + tie_half:cx + collar_half].mean()
+        )
+        shirt = _score(flank, 0.3, 0.05)
+
+        # Tie: a non-white band down the middle of a white shirt
+        column = ~white[top:chest_bottom, cx - tie_half:cx + tie_half + 1]
+        tie = _score(column.mean() * flank, 0.2, 0.04)
+
+        # ID card: printed card text gives dense edges on the lower chest
+        lower = gray[chest_bottom:, max(cx - fw, 0):min(cx + fw, width)].astype(np.float32)
+        edges = np.abs(np.diff(lower, axis=1)) > 40 if lower.size else np.zeros(1)
+        id_card = _score(edges.mean(), 0.08, 0.02)
+
+        # Beard: chin noticeably darker than the cheeks
+        cheeks = val[fy + fh * 45 // 100:fy + fh * 60 // 100, fx + fw // 4:fx + fw * 3 // 4]
+        chin = val[fy + fh * 78 // 100:fy + fh, fx + fw // 4:fx + fw * 3 // 4]
+        drop = (cheeks.mean() - chin.mean()) / max(cheeks.mean(), 1) if cheeks.size and chin.size else 0
+        beard = _score(drop, 0.25, 0.05)
+
+        # A guessed face position makes every region less trustworthy
+        certainty = 1.0 if located else 0.8
+        results = {}
+        for name, likelihood in zip(UNIFORM_ITEMS + ["beard"], [blazer, tie, shirt, id_card, beard]):
+            results[name] = {
+                "present": bool(likelihood >= 0.5),
+                "confidence": round(float(max(likelihood, 1 - likelihood)) * certainty, 3)
+            }
+        results["overall_compliance"] = all(results[name]["present"] for name in UNIFORM_ITEMS)
+        return results
+
+    def classify(self, image_path: str):
+        """Return (results, confident); results is None when the frame can't be judged.
+
+        Only clearly compliant frames are decided locally; anything flagged as
+        missing is left to the model so a heuristic never records a violation.
+        """
+        start = time.perf_counter()
+        try:
+            results = self._classify(image_path)
+        except Exception as e:
+            print(f"Error in local uniform classifier: {e}")
+            results = None
+        self._total_ms += (time.perf_counter() - start) * 1000
+        self.classified += 1
+
+        confident = results is not None and results["overall_compliance"] and all(
+            item["confidence"] >= self.min_confidence
+            for item in results.values() if isinstance(item, dict)
+        )
+        if confident:
+            self.decided_locally += 1
+        else:
+            self.escalated += 1
+        return results, confident
+
+    def stats(self):
+        return {
+            "enabled": CASCADE_ENABLED,
+            "min_confidence": self.min_confidence,
+            "classified": self.classified,
+            "decided_locally": self.decided_locally,
+            "escalated": self.escalated,
+            "local_rate": round(self.decided_locally / self.classified, 3) if self.classified else 0.0,
+            "avg_local_ms": round(self._total_ms / self.classified, 2) if self.classified else 0.0
+        }
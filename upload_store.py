@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import os
+import uuid
+
+UPLOAD_DIR = "static/uploads"
+
+# Read/write size while streaming an upload to disk
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# Partially received uploads live here until their hash is known
+INCOMING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+
+
+def content_path(digest: str, extension=".jpg", directory=UPLOAD_DIR):
+    """Sharded location for a content hash: ab/cd/abcd....jpg"""
+    return os.path.join(directory, digest[:2], digest[2:4], f"{digest}{extension}")
+
+
+def _commit(tmp_path: str, path: str):
+    """Move a finished upload into place, dropping it if the content is already stored"""
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return True
+
+
+async def save_upload(upload, extension=".jpg"):
+    """Stream an UploadFile to content-addressed storage; returns (sha256, path)"""
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    tmp_path = os.path.join(INCOMING_DIR, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.remove, tmp_path)
+        raise
+    await asyncio.to_thread(f.close)
+
+    digest = hasher.hexdigest()
+    path = content_path(digest, extension)
+    stored = await asyncio.to_thread(_commit, tmp_path, path)
+    if not stored:
+        print(f"Duplicate upload {digest[:12]}, reusing stored copy")
+    return digest, path
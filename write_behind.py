@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+
+# "off": one INSERT and commit per check; "sync": group-committed, but each check waits for its flush;
+# "async": each check returns once buffered and is written by a later flush
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "off")
+
+# A flush happens at this many buffered rows, or this long after the first one arrived
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "50"))
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "20"))
+
+# Rows held in memory (buffered plus being flushed) before new writes wait for room
+WRITE_BEHIND_MAX_BUFFER = int(os.getenv("WRITE_BEHIND_MAX_BUFFER", "1000"))
+
+# Attempts per batch in async mode before its rows are dropped and logged
+WRITE_BEHIND_ATTEMPTS = 3
+
+
+class WriteBehindBuffer:
+    """Buffers rows and writes them in groups with flush_fn(rows), one multi-row INSERT per flush"""
+
+    def __init__(self, flush_fn, mode=WRITE_BEHIND, max_rows=WRITE_BEHIND_MAX_ROWS,
+                 max_delay_ms=WRITE_BEHIND_MAX_DELAY_MS, max_buffer=WRITE_BEHIND_MAX_BUFFER, permanent_errors=()):
+        self.flush_fn = flush_fn
+        # Errors caused by the rows themselves (e.g. IntegrityError): retrying the same batch can't succeed
+        self.permanent_errors = tuple(permanent_errors)
+        self.mode = mode
+        self.max_rows = max_rows
+        self.max_delay_ms = max_delay_ms
+        self.max_buffer = max(max_buffer, max_rows)
+        self._pending = []  # (row, future or None, attempts)
+        self._in_flight = 0
+        self._timer = None
+        self._tasks = set()
+        self._room = asyncio.Condition()
+        self.batches = 0
+        self.rows = 0
+        self.max_batch = 0
+        self._total_flush = 0.0
+        self.max_flush = 0.0
+        self.flush_errors = 0
+        self.dropped = 0
+        self.splits = 0
+        self.waited_for_room = 0
+
+    async def add(self, row):
+        """Buffer a row; in sync mode this returns only once the row is committed (or raises)"""
+        async with self._room:
+            if len(self._pending) + self._in_flight >= self.max_buffer:
+                self.waited_for_room += 1
+                await self._room.wait_for(lambda: len(self._pending) + self._in_flight < self.max_buffer)
+
+            future = asyncio.get_running_loop().create_future() if self.mode == "sync" else None
+            self._pending.append((row, future, 0))
+            if len(self._pending) >= self.max_rows:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay_ms / 1000, self._flush)
+
+        if future is not None:
+            await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            self._in_flight += len(batch)
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        start = time.monotonic()
+        try:
+            await self.flush_fn([row for row, _, _ in batch])
+        except Exception as e:
+            permanent = isinstance(e, self.permanent_errors)
+            if permanent and len(batch) > 1:
+                # One bad row fails the whole multi-row write; halve the batch until it is isolated
+                # so the other rows still get written (flush_fn must be all-or-nothing)
+                self.splits += 1
+                middle = len(batch) // 2
+                await self._run(batch[:middle])
+                await self._run(batch[middle:])
+                return
+
+            self.flush_errors += 1
+            print(f"Error flushing {len(batch)} buffered rows: {e}")
+            retry = []
+            for row, future, attempts in batch:
+                if future is not None:
+                    if not future.done():
+                        future.set_exception(e)
+                elif not permanent and attempts + 1 < WRITE_BEHIND_ATTEMPTS:
+                    retry.append((row, None, attempts + 1))
+                else:
+                    self.dropped += 1
+                    if permanent:
+                        print(f"Dropped buffered row {row[:3]}: {e}")
+            await self._done(len(batch), retry)
+            return
+
+        elapsed = time.monotonic() - start
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        self._total_flush += elapsed
+        self.max_flush = max(self.max_flush, elapsed)
+        for _, future, _ in batch:
+            if future is not None and not future.done():
+                future.set_result(True)
+        await self._done(len(batch), [])
+
+    async def _done(self, count, retry):
+        async with self._room:
+            self._in_flight -= count
+            if retry:
+                # Retried rows go ahead of newer ones and ride along with the next flush
+                self._pending[:0] = retry
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(self.max_delay_ms / 1000, self._flush)
+            self._room.notify_all()
+
+    async def close(self):
+        """Flush whatever is buffered, including retries, and wait for it (call from the app's shutdown event)"""
+        while self._pending or self._tasks:
+            self._flush()
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "max_rows": self.max_rows,
+            "max_delay_ms": self.max_delay_ms,
+            "buffered": len(self._pending),
+            "in_flight": self._in_flight,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "avg_flush_ms": round(self._total_flush / self.batches * 1000, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush * 1000, 2),
+            "flush_errors": self.flush_errors,
+            "dropped_rows": self.dropped,
+            "batch_splits": self.splits,
+            "waited_for_room": self.waited_for_room
+        }